@@ -9,15 +9,196 @@ import os
 import time
 import cv2
 import threading
-import base64
+import traceback
 import numpy as np
-from queue import Queue
+from queue import Empty, Full, Queue
+from typing import List, Optional, Tuple
 
 # 添加项目根目录到 Python 路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import uiautomator2 as u2
 
+try:
+    from pybase64 import b64decode
+except ImportError:  # pybase64（SIMD 加速）为可选依赖，未安装时使用标准库
+    from base64 import b64decode
+
+try:
+    from turbojpeg import TJPF_BGR, TurboJPEG
+    _tj = TurboJPEG()
+except (ImportError, OSError, RuntimeError):  # 未安装 PyTurboJPEG 或找不到 libturbojpeg 时回退到 cv2
+    _tj = None
+
+# 设置环境变量 USE_NVJPEG=1 且安装了 nvidia-nvimgcodec 时，使用 GPU (nvJPEG) 解码
+_nv_decoder = None
+if os.getenv("USE_NVJPEG") == "1":
+    try:
+        from nvidia import nvimgcodec
+        _nv_decoder = nvimgcodec.Decoder()
+    except Exception:  # 没有 CUDA 环境时回退到 CPU 解码
+        _nv_decoder = None
+
+
+# JPEG 解码器可以直接在 IDCT 阶段输出 1/2、1/4、1/8 尺寸，比全尺寸解码后再缩放省很多计算
+_DCT_SCALES = ((1, 1), (1, 2), (1, 4), (1, 8))
+_CV2_REDUCED_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+def choose_scale(src_width: float, dst_width: float) -> Tuple[int, int]:
+    """选择最小的 DCT 缩放比例，保证解码后的宽度仍不小于显示宽度"""
+    best = _DCT_SCALES[0]
+    if src_width <= 0 or dst_width <= 0:
+        return best
+    for num, den in _DCT_SCALES:
+        if src_width * num / den < dst_width:
+            break
+        best = (num, den)
+    return best
+
+
+def decode_jpeg(jpg_raw: bytes, scaling_factor: Tuple[int, int] = (1, 1),
+                dst: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+    """解码 JPEG 为 BGR 图像，优先使用 libjpeg-turbo，不可用或解码失败时回退到 cv2.imdecode
+
+    Args:
+        jpg_raw: JPEG 数据
+        scaling_factor: IDCT 阶段的缩放比例 (num, den)，取值见 _DCT_SCALES
+        dst: 预分配的输出缓冲，尺寸一致时 libjpeg-turbo 直接解码到其中
+    """
+    if _nv_decoder is not None:
+        try:
+            # nvimgcodec 输出 RGB，需要转换为 cv2 使用的 BGR；nvJPEG 不支持 DCT 缩放，需要单独缩小
+            img = np.asarray(_nv_decoder.decode(jpg_raw).cpu())
+            if scaling_factor == (1, 1):
+                return cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
+            # 先缩小再转换颜色，需要转换的像素更少；resize 的输出归自己所有，可以原地转换
+            fx = scaling_factor[0] / scaling_factor[1]
+            img = cv2.resize(img, None, fx=fx, fy=fx, interpolation=cv2.INTER_AREA)
+            return cv2.cvtColor(img, cv2.COLOR_RGB2BGR, dst=img)
+        except Exception:
+            pass  # GPU 解码失败时交给 CPU 解码
+    if _tj is not None:
+        try:
+            # libjpeg-turbo 在颜色转换阶段直接输出 BGR，不再需要 cvtColor。
+            # 不使用 TJPF_BGRX：imshow 和文字叠加需要连续的 3 通道数组，[..., :3] 视图最终仍会被复制一次
+            if dst is not None:
+                try:
+                    return _tj.decode(jpg_raw, pixel_format=TJPF_BGR, scaling_factor=scaling_factor, dst=dst)
+                except (TypeError, ValueError):
+                    pass  # 旧版本 PyTurboJPEG 不支持 dst，或帧尺寸发生了变化
+            return _tj.decode(jpg_raw, pixel_format=TJPF_BGR, scaling_factor=scaling_factor)
+        except Exception:
+            pass  # 损坏的帧交给 cv2 再尝试一次
+    # cv2 的 IMREAD_REDUCED_COLOR_* 同样走 libjpeg 的 DCT 缩放，无需再 cv2.resize
+    flag = _CV2_REDUCED_FLAGS[scaling_factor[1] // scaling_factor[0]]
+    return cv2.imdecode(np.frombuffer(jpg_raw, np.uint8), flag)
+
+
+class FrameBuffer:
+    """
+    最新帧交换区（三缓冲）
+    
+    生产者解码到后台缓冲后提交，消费者只取最新一帧；交换只是在锁内调换下标。
+    缓冲区按首帧尺寸分配后循环复用，稳态下没有新的内存分配，也不会出现画面撕裂
+    """
+    __slots__ = ('_lock', '_fresh', '_consumer_ready', '_slots', '_back', '_ready', '_front')
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._fresh = threading.Event()  # 有未取走的新帧
+        self._consumer_ready = threading.Event()  # 上一帧已被取走
+        self._consumer_ready.set()
+        self._slots: List[Optional[np.ndarray]] = [None, None, None]
+        self._back, self._ready, self._front = 0, 1, 2
+    
+    def back_buffer(self) -> Optional[np.ndarray]:
+        """生产者：返回可写入的后台缓冲（尚未分配时返回 None）"""
+        return self._slots[self._back]
+    
+    def publish(self, frame: np.ndarray):
+        """生产者：提交一帧，frame 可以是后台缓冲本身，也可以是新分配的数组"""
+        with self._lock:
+            self._slots[self._back] = frame
+            self._back, self._ready = self._ready, self._back
+            self._consumer_ready.clear()
+            self._fresh.set()
+    
+    def wait_consumer_ready(self, timeout: float) -> bool:
+        """生产者：等待消费者取走上一帧，超时返回 False"""
+        return self._consumer_ready.wait(timeout)
+    
+    def take(self, timeout: float = 0) -> Optional[np.ndarray]:
+        """
+        消费者：取出最新一帧，返回的数组在下次 take 之前归消费者独占
+        
+        Args:
+            timeout: 没有新帧时最多等待的秒数，0 表示不等待
+        
+        Returns:
+            最新一帧，超时仍没有新帧时返回 None
+        """
+        if timeout and not self._fresh.wait(timeout):
+            return None
+        with self._lock:
+            if not self._fresh.is_set():
+                return None
+            self._front, self._ready = self._ready, self._front
+            self._fresh.clear()
+            self._consumer_ready.set()
+            return self._slots[self._front]
+
+
+class TextOverlay:
+    """
+    预渲染的文字贴片，文字不变时不必每帧调用 cv2.putText 重新光栅化字形
+    """
+    __slots__ = ('_alpha', '_color', '_origin')
+    
+    def __init__(self, text: str, font_scale: float, color: Tuple[int, int, int], thickness: int):
+        font = cv2.FONT_HERSHEY_SIMPLEX
+        (w, h), baseline = cv2.getTextSize(text, font, font_scale, thickness)
+        self._origin = (thickness, h + thickness)  # 文字基线在贴片中的位置
+        mask = np.zeros((h + baseline + 2 * thickness, w + 2 * thickness), np.uint8)
+        cv2.putText(mask, text, self._origin, font, font_scale, 255, thickness)
+        # 保留抗锯齿边缘：按 alpha 混合而不是直接覆盖
+        self._alpha = (mask.astype(np.float32) / 255)[..., None]
+        self._color = self._alpha * np.array(color, np.float32)
+    
+    def draw(self, img: np.ndarray, org: Tuple[int, int]):
+        """把文字贴到 img 上，org 与 cv2.putText 一样是文字基线的左端点"""
+        x = max(org[0] - self._origin[0], 0)
+        y = max(org[1] - self._origin[1], 0)
+        roi = img[y:y + self._alpha.shape[0], x:x + self._alpha.shape[1]]
+        h, w = roi.shape[:2]
+        alpha = self._alpha[:h, :w]
+        roi[:] = roi * (1 - alpha) + self._color[:h, :w]
+
+
+def pin_current_thread(cpu: int):
+    """
+    把当前线程绑定到指定的 CPU，避免解码线程和显示线程在同一个核心上来回切换
+    
+    只支持 Linux 和 Windows，CPU 不存在或没有权限时不做任何事
+    """
+    try:
+        if hasattr(os, "sched_setaffinity"):
+            # Linux 上 pid 0 表示调用线程本身
+            if cpu in os.sched_getaffinity(0):
+                os.sched_setaffinity(0, {cpu})
+        elif os.name == "nt":
+            import ctypes
+            if cpu < (os.cpu_count() or 1):
+                kernel32 = ctypes.windll.kernel32
+                kernel32.SetThreadAffinityMask(kernel32.GetCurrentThread(), 1 << cpu)
+    except (OSError, AttributeError):
+        pass
+
 
 def main():
     # 设备地址（WiFi 模式）
@@ -77,128 +258,160 @@ def main():
     # 性能优化参数
     SCREENSHOT_QUALITY = 50  # 降低质量到50，减少传输数据量
     SCREENSHOT_SCALE = 0.8   # 使用0.8倍缩放，进一步减少数据量（可选）
-    QUEUE_SIZE = 1           # 队列大小设为1，只保留最新帧，减少内存占用
+    WINDOW_CHECK_INTERVAL = 0.1  # 窗口状态检查间隔（秒）
+    DISPLAY_CPU = 0  # 显示（主）线程绑定的 CPU
+    DECODE_CPU = 2   # 解码线程绑定的 CPU，和显示线程错开，超线程机器上通常落在另一个物理核
+    
+    # 截图比窗口大得多时，直接在 JPEG 解码阶段缩小（只计算一次）
+    dct_scale = (1, 1)
+    if screen_width > 0 and screen_height > 0:
+        dct_scale = choose_scale(screen_width * SCREENSHOT_SCALE, display_width)
+        if dct_scale != (1, 1):
+            print(f"解码缩放: {dct_scale[0]}/{dct_scale[1]}")
     
-    # 使用队列进行多线程处理
-    screenshot_queue = Queue(maxsize=QUEUE_SIZE)
+    # 抓取 → 解码 → 显示 三级流水线，网络等待、JPEG 解码和窗口绘制互相重叠
+    raw_queue = Queue(maxsize=2)  # 有界队列提供背压
+    frames = FrameBuffer()        # 解码线程与显示线程之间只交换最新一帧
     running = threading.Event()
     running.set()
     
     frame_count = 0
-    start_time = time.time()
-    last_fps_update = time.time()
+    start_time = time.monotonic()
+    last_fps_update = start_time
     current_fps = 0.0
+    fps_overlay: Optional[TextOverlay] = None  # FPS 只在数值更新时重新渲染
     
-    def screenshot_thread():
-        """截图线程，持续获取截图"""
-        check_counter = 0
+    def fetch_thread():
+        """抓取线程，持续获取 base64 编码的截图"""
         while running.is_set():
             try:
-                # 降低窗口检查频率（每10次检查一次）
-                check_counter += 1
-                if check_counter >= 10:
+                # 截屏（优化：降低质量和尺寸）
+                base64_data = d.jsonrpc.takeScreenshot(SCREENSHOT_SCALE, SCREENSHOT_QUALITY)
+                if not base64_data:
+                    time.sleep(0.005)  # 减少等待时间
+                    continue
+                # 解码跟不上时在这里等待（背压），同时响应退出
+                while running.is_set():
                     try:
-                        window_prop = cv2.getWindowProperty(window_name, cv2.WND_PROP_VISIBLE)
-                        if window_prop is None or (isinstance(window_prop, (int, float)) and window_prop <= 0):
-                            break
-                    except Exception:
+                        raw_queue.put(base64_data, timeout=0.1)
                         break
-                    check_counter = 0
-                
-                # 截屏（优化：降低质量和尺寸）
-                try:
-                    # 使用较低的质量和缩放比例
-                    base64_data = d.jsonrpc.takeScreenshot(SCREENSHOT_SCALE, SCREENSHOT_QUALITY)
-                    if base64_data:
-                        # 直接使用 cv2.imdecode，比 PIL + image_convert 更快
-                        jpg_raw = base64.b64decode(base64_data)
-                        # 使用 cv2.imdecode 直接解码为 numpy 数组
-                        nparr = np.frombuffer(jpg_raw, np.uint8)
-                        screenshot = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-                        
-                        if screenshot is not None:
-                            # 如果队列满了，丢弃最旧的帧（保持最新）
-                            if screenshot_queue.full():
-                                try:
-                                    screenshot_queue.get_nowait()
-                                except:
-                                    pass
-                            screenshot_queue.put(screenshot, timeout=0.05)
-                    else:
-                        time.sleep(0.005)  # 减少等待时间
-                except Exception:
-                    time.sleep(0.005)
-                    
+                    except Full:
+                        pass
             except Exception:
                 time.sleep(0.005)
     
-    # 启动截图线程
-    screenshot_thread_obj = threading.Thread(target=screenshot_thread, daemon=True)
-    screenshot_thread_obj.start()
+    def decode_thread():
+        """解码线程，把 JPEG 解码到预分配的缓冲中"""
+        pin_current_thread(DECODE_CPU)
+        get_nowait = raw_queue.get_nowait
+        decode_errors = 0
+        while running.is_set():
+            # 显示线程还没取走上一帧时先不解码，之后只解码队列中最新的一帧，
+            # 跳过的中间帧不再做 IDCT（显示跟不上时大部分解码都可以省掉）
+            if not frames.wait_consumer_ready(0.1):
+                continue
+            base64_data = None
+            try:
+                base64_data = raw_queue.get(timeout=0.1)
+                while True:
+                    base64_data = get_nowait()
+            except Empty:
+                pass
+            if base64_data is None:
+                continue
+            try:
+                jpg_raw = b64decode(base64_data)
+                # 直接解码为 BGR numpy 数组（优先 libjpeg-turbo）
+                screenshot = decode_jpeg(jpg_raw, dct_scale, dst=frames.back_buffer())
+                if screenshot is not None:
+                    # 提交给显示线程
+                    frames.publish(screenshot)
+            except Exception:
+                # 偶尔的损坏帧直接跳过；只打印第一次的异常堆栈，避免刷屏又不会把解码 bug 完全隐藏
+                decode_errors += 1
+                if decode_errors == 1:
+                    print("解码失败（之后的解码异常不再输出）:")
+                    traceback.print_exc()
+    
+    # 启动抓取、解码线程，主线程只负责显示
+    # （imshow/waitKey 不放到子线程：Qt、Cocoa 等 HighGUI 后端只允许在主线程操作窗口）
+    worker_threads = [
+        threading.Thread(target=fetch_thread, name="fetch", daemon=True),
+        threading.Thread(target=decode_thread, name="decode", daemon=True),
+    ]
+    for t in worker_threads:
+        t.start()
+    # 在子线程启动之后再绑定主线程，新线程会继承创建者的 CPU 亲和性
+    pin_current_thread(DISPLAY_CPU)
     
+    # 主循环每帧都要调用的函数先绑定到局部变量，省去每次的全局/属性查找
+    take_frame = frames.take
+    imshow = cv2.imshow
+    wait_key = cv2.waitKey
+    monotonic = time.monotonic
+    get_window_property = cv2.getWindowProperty
+    WND_PROP_VISIBLE = cv2.WND_PROP_VISIBLE
+    
+    display_errors = 0
     try:
+        next_window_check = 0.0
         while True:
             try:
-                # 每次循环都检查窗口状态（确保及时响应窗口关闭）
-                try:
-                    window_prop = cv2.getWindowProperty(window_name, cv2.WND_PROP_VISIBLE)
-                    if window_prop is None or (isinstance(window_prop, (int, float)) and window_prop <= 0):
-                        print("检测到窗口已关闭")
+                # 检查窗口状态（getWindowProperty 要跨越到 GUI 后端，最多每 100ms 检查一次）
+                now = monotonic()
+                if now >= next_window_check:
+                    next_window_check = now + WINDOW_CHECK_INTERVAL
+                    try:
+                        # getWindowProperty 总是返回 float，窗口关闭后为 -1 或 0
+                        if get_window_property(window_name, WND_PROP_VISIBLE) <= 0:
+                            print("检测到窗口已关闭")
+                            break
+                    except Exception:
+                        # 窗口不存在时也会抛出异常
+                        print("窗口不存在")
                         break
-                except Exception:
-                    # 窗口不存在时也会抛出异常
-                    print("窗口不存在")
-                    break
                 
-                # 从队列获取最新截图（非阻塞）
-                screenshot = None
-                try:
-                    screenshot = screenshot_queue.get_nowait()
-                except:
-                    pass
+                # 获取最新截图，没有新帧时短暂等待，避免空转（同时保证 waitKey 能及时处理窗口事件）
+                screenshot = take_frame(0.01)
                 
                 if screenshot is not None:
                     frame_count += 1
                     
                     # 每0.5秒更新一次FPS显示
-                    now = time.time()
+                    now = monotonic()
                     if now - last_fps_update >= 0.5:
                         elapsed = now - start_time
                         if elapsed > 0:
                             current_fps = frame_count / elapsed
+                            fps_overlay = TextOverlay(f"FPS: {current_fps:.1f}", 0.7, (0, 255, 0), 2)
                         last_fps_update = now
                     
                     # 显示FPS（直接在原图上绘制，因为这是显示用的）
-                    if current_fps > 0:
-                        cv2.putText(screenshot, f"FPS: {current_fps:.1f}", (10, 30),
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+                    if fps_overlay is not None:
+                        fps_overlay.draw(screenshot, (10, 30))
                     
                     # 显示图片
-                    cv2.imshow(window_name, screenshot)
+                    imshow(window_name, screenshot)
                 
                 # 检查按键（使用非阻塞模式）
-                key = cv2.waitKey(1) & 0xFF
+                key = wait_key(1) & 0xFF
                 if key == ord('q'):
                     print("退出投屏")
                     break
                 
-                # 在 waitKey 之后再次检查窗口状态（窗口可能在显示过程中被关闭）
-                try:
-                    window_prop = cv2.getWindowProperty(window_name, cv2.WND_PROP_VISIBLE)
-                    if window_prop is None or (isinstance(window_prop, (int, float)) and window_prop <= 0):
-                        break
-                except Exception:
-                    break
-                
             except KeyboardInterrupt:
                 break
-            except Exception:
-                pass  # 静默处理异常，不输出
+            except cv2.error as e:
+                # 只容忍 HighGUI 窗口相关的 cv2 错误，第一次时输出；其它异常（如绘制 bug）直接抛出
+                display_errors += 1
+                if display_errors == 1:
+                    print(f"显示失败（之后的显示异常不再输出）: {e}")
                 
     finally:
-        # 停止截图线程
+        # 停止抓取、解码线程
         running.clear()
-        screenshot_thread_obj.join(timeout=1.0)
+        for t in worker_threads:
+            t.join(timeout=1.0)
         # 关闭窗口
         try:
             cv2.destroyWindow(window_name)
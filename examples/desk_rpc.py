@@ -6,32 +6,283 @@
 """
 
 import json
+import os
+import socket
 import time
 import cv2
 import threading
-import base64
+import traceback
 import numpy as np
-from queue import Queue
+from queue import Empty, Full, Queue
 import requests
-from typing import Optional, Tuple, Any
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from typing import Any, Dict, List, Optional, Tuple, Union
 
+try:
+    from pybase64 import b64decode
+except ImportError:  # pybase64（SIMD 加速）为可选依赖，未安装时使用标准库
+    from base64 import b64decode
+
+try:
+    import orjson
+except ImportError:  # orjson 为可选依赖，未安装时回退到标准库 json
+    orjson = None
+
+if orjson is not None:
+    _json_dumps = orjson.dumps
+    _json_loads = orjson.loads
+else:
+    def _json_dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+    _json_loads = json.loads
+
+try:
+    from websocket import WebSocketTimeoutException, create_connection as _ws_connect
+except ImportError:  # websocket-client 为可选依赖，未安装时只能逐帧请求截图
+    _ws_connect = WebSocketTimeoutException = None
+
+try:
+    from turbojpeg import TJPF_BGR, TurboJPEG
+    _tj = TurboJPEG()
+except (ImportError, OSError, RuntimeError):  # 未安装 PyTurboJPEG 或找不到 libturbojpeg 时回退到 cv2
+    _tj = None
+
+# 设置环境变量 USE_NVJPEG=1 且安装了 nvidia-nvimgcodec 时，使用 GPU (nvJPEG) 解码
+_nv_decoder = None
+if os.getenv("USE_NVJPEG") == "1":
+    try:
+        from nvidia import nvimgcodec
+        _nv_decoder = nvimgcodec.Decoder()
+    except Exception:  # 没有 CUDA 环境时回退到 CPU 解码
+        _nv_decoder = None
+
+
+def decode_jpeg(jpg_raw: Union[bytes, memoryview], dst: Optional[np.ndarray] = None) -> Optional[np.ndarray]:
+    """解码 JPEG 为 BGR 图像，优先使用 libjpeg-turbo，不可用或解码失败时回退到 cv2.imdecode
+
+    Args:
+        jpg_raw: JPEG 数据
+        dst: 预分配的输出缓冲，尺寸一致时 libjpeg-turbo 直接解码到其中
+    """
+    if _nv_decoder is not None:
+        try:
+            # nvimgcodec 输出 RGB，转换为 cv2 使用的 BGR
+            return cv2.cvtColor(np.asarray(_nv_decoder.decode(jpg_raw).cpu()), cv2.COLOR_RGB2BGR)
+        except Exception:
+            pass  # GPU 解码失败时交给 CPU 解码
+    if _tj is not None:
+        try:
+            # libjpeg-turbo 在颜色转换阶段直接输出 BGR，不再需要 cvtColor。
+            # 不使用 TJPF_BGRX：imshow 和文字叠加需要连续的 3 通道数组，[..., :3] 视图最终仍会被复制一次
+            if dst is not None:
+                try:
+                    return _tj.decode(jpg_raw, pixel_format=TJPF_BGR, dst=dst)
+                except (TypeError, ValueError):
+                    pass  # 旧版本 PyTurboJPEG 不支持 dst，或帧尺寸发生了变化
+            return _tj.decode(jpg_raw, pixel_format=TJPF_BGR)
+        except Exception:
+            pass  # 损坏的帧交给 cv2 再尝试一次
+    return cv2.imdecode(np.frombuffer(jpg_raw, np.uint8), cv2.IMREAD_COLOR)
+
+
+class FrameBuffer:
+    """
+    最新帧交换区（三缓冲）
+    
+    生产者解码到后台缓冲后提交，消费者只取最新一帧；交换只是在锁内调换下标。
+    缓冲区按首帧尺寸分配后循环复用，稳态下没有新的内存分配，也不会出现画面撕裂
+    """
+    __slots__ = ('_lock', '_fresh', '_consumer_ready', '_slots', '_back', '_ready', '_front')
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._fresh = threading.Event()  # 有未取走的新帧
+        self._consumer_ready = threading.Event()  # 上一帧已被取走
+        self._consumer_ready.set()
+        self._slots: List[Optional[np.ndarray]] = [None, None, None]
+        self._back, self._ready, self._front = 0, 1, 2
+    
+    def back_buffer(self) -> Optional[np.ndarray]:
+        """生产者：返回可写入的后台缓冲（尚未分配时返回 None）"""
+        return self._slots[self._back]
+    
+    def publish(self, frame: np.ndarray):
+        """生产者：提交一帧，frame 可以是后台缓冲本身，也可以是新分配的数组"""
+        with self._lock:
+            self._slots[self._back] = frame
+            self._back, self._ready = self._ready, self._back
+            self._consumer_ready.clear()
+            self._fresh.set()
+    
+    def wait_consumer_ready(self, timeout: float) -> bool:
+        """生产者：等待消费者取走上一帧，超时返回 False"""
+        return self._consumer_ready.wait(timeout)
+    
+    def take(self, timeout: float = 0) -> Optional[np.ndarray]:
+        """
+        消费者：取出最新一帧，返回的数组在下次 take 之前归消费者独占
+        
+        Args:
+            timeout: 没有新帧时最多等待的秒数，0 表示不等待
+        
+        Returns:
+            最新一帧，超时仍没有新帧时返回 None
+        """
+        if timeout and not self._fresh.wait(timeout):
+            return None
+        with self._lock:
+            if not self._fresh.is_set():
+                return None
+            self._front, self._ready = self._ready, self._front
+            self._fresh.clear()
+            self._consumer_ready.set()
+            return self._slots[self._front]
+
+
+class TextOverlay:
+    """
+    预渲染的文字贴片，文字不变时不必每帧调用 cv2.putText 重新光栅化字形
+    """
+    __slots__ = ('_alpha', '_color', '_origin')
+    
+    def __init__(self, text: str, font_scale: float, color: Tuple[int, int, int], thickness: int):
+        font = cv2.FONT_HERSHEY_SIMPLEX
+        (w, h), baseline = cv2.getTextSize(text, font, font_scale, thickness)
+        self._origin = (thickness, h + thickness)  # 文字基线在贴片中的位置
+        mask = np.zeros((h + baseline + 2 * thickness, w + 2 * thickness), np.uint8)
+        cv2.putText(mask, text, self._origin, font, font_scale, 255, thickness)
+        # 保留抗锯齿边缘：按 alpha 混合而不是直接覆盖
+        self._alpha = (mask.astype(np.float32) / 255)[..., None]
+        self._color = self._alpha * np.array(color, np.float32)
+    
+    def draw(self, img: np.ndarray, org: Tuple[int, int]):
+        """把文字贴到 img 上，org 与 cv2.putText 一样是文字基线的左端点"""
+        x = max(org[0] - self._origin[0], 0)
+        y = max(org[1] - self._origin[1], 0)
+        roi = img[y:y + self._alpha.shape[0], x:x + self._alpha.shape[1]]
+        h, w = roi.shape[:2]
+        alpha = self._alpha[:h, :w]
+        roi[:] = roi * (1 - alpha) + self._color[:h, :w]
+
+
+def pin_current_thread(cpu: int):
+    """
+    把当前线程绑定到指定的 CPU，避免解码线程和显示线程在同一个核心上来回切换
+    
+    只支持 Linux 和 Windows，CPU 不存在或没有权限时不做任何事
+    """
+    try:
+        if hasattr(os, "sched_setaffinity"):
+            # Linux 上 pid 0 表示调用线程本身
+            if cpu in os.sched_getaffinity(0):
+                os.sched_setaffinity(0, {cpu})
+        elif os.name == "nt":
+            import ctypes
+            if cpu < (os.cpu_count() or 1):
+                kernel32 = ctypes.windll.kernel32
+                kernel32.SetThreadAffinityMask(kernel32.GetCurrentThread(), 1 << cpu)
+    except (OSError, AttributeError):
+        pass
+
+
+_RESULT_PREFIX = b'"result":"'
+
+
+def _extract_base64_result(content: Union[bytes, bytearray], length: Optional[int] = None) -> Optional[memoryview]:
+    """
+    不经过 JSON 解析，直接从 JSON-RPC 响应中截取 result 字段的 base64 数据
+    
+    Args:
+        content: 响应内容
+        length: content 中有效数据的长度（复用的缓冲区尾部可能残留旧数据），None 表示全部
+    
+    Returns:
+        指向 content 的 memoryview（零拷贝），找不到或包含转义字符时返回 None
+    """
+    if length is None:
+        length = len(content)
+    start = content.find(_RESULT_PREFIX, 0, length)
+    if start < 0:
+        return None
+    start += len(_RESULT_PREFIX)
+    end = content.find(b'"', start, length)
+    if end < 0 or content.find(b'\\', start, end) >= 0:
+        return None
+    return memoryview(content)[start:end]
+
+
+def _read_body(response: requests.Response, buf: bytearray) -> int:
+    """
+    把 stream=True 的响应体读入可复用的 buf，不够时扩容
+    
+    Returns:
+        读入的字节数
+    """
+    length = response.headers.get('Content-Length')
+    if length and int(length) > len(buf):
+        buf.extend(bytes(int(length) - len(buf)))
+    readinto = response.raw.readinto
+    size = 0
+    while True:
+        if size == len(buf):
+            buf.extend(bytes(len(buf)))  # 按倍数扩容
+        n = readinto(memoryview(buf)[size:])
+        if not n:
+            return size
+        size += n
+
+
+class TunedAdapter(HTTPAdapter):
+    """调大 socket 接收缓冲区，截图（30-300KB）可以一次收完，减少短读和延迟抖动"""
+    
+    # urllib3 默认已经设置了 TCP_NODELAY
+    SOCKET_OPTIONS = HTTPConnection.default_socket_options + [
+        (socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20),
+    ]
+    
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['socket_options'] = self.SOCKET_OPTIONS
+        return super().init_poolmanager(*args, **kwargs)
 
 
 class U2RPCClient:
     """uiautomator2 JSON-RPC 客户端（纯协议实现）"""
     
-    def __init__(self, host: str, port: int = 9008, timeout: float = 10.0):
+    def __init__(self, host: str, port: int = 9008, timeout: float = 10.0, stream_port: int = 7912,
+                 compress_rpc: bool = False):
         """
         Args:
             host: 设备 IP 地址
             port: 设备端口（默认 9008）
             timeout: 请求超时时间（秒）
+            stream_port: atx-agent 端口（默认 7912），提供 /minicap 连续截图流
+            compress_rpc: 是否允许服务端 gzip 压缩截图以外的 RPC 响应（如层级 XML），
+                限速的 WiFi 下可以减少传输量。nanohttpd 的 gzip 有资源泄漏问题，默认关闭
         """
         self.host = host
         self.port = port
         self.timeout = timeout
+        self.stream_port = stream_port
         self.base_url = f"http://{host}:{port}"
+        self._jsonrpc_url = f"{self.base_url}/jsonrpc/0"
+        self._screenshot_url = f"{self.base_url}/screenshot/0"
+        self._raw_screenshot: Optional[bool] = None  # 是否支持 /screenshot/0，首次截图时探测
         self._rpc_id = 1
+        self._screenshot_prefixes: Dict[Tuple[float, int], bytes] = {}  # 预编译的截图请求体（id 之前的部分）
+        self._display_size: Optional[Tuple[int, int]] = None  # 屏幕尺寸，首次 device_info 时缓存
+        
+        # 复用同一个 Session（HTTP/1.1 keep-alive），避免每次请求重新建立 TCP 连接
+        self._session = requests.Session()
+        self._session.mount("http://", TunedAdapter())
+        self._session.headers.update({
+            'User-Agent': 'uiautomator2',
+            'Accept-Encoding': '',  # 避免 gzip 压缩（nanohttpd 有资源泄漏问题）
+            'Content-Type': 'application/json'
+        })
+        # 截图本身就是 JPEG，压缩只会浪费设备 CPU，始终不压缩；其他 RPC 按 compress_rpc 决定
+        self._binary_headers = {'Accept-Encoding': ''}
+        self._rpc_headers = {'Accept-Encoding': 'gzip, deflate' if compress_rpc else ''}
         
         # 检查服务器是否可用
         self._check_alive()
@@ -39,11 +290,7 @@ class U2RPCClient:
     def _check_alive(self):
         """检查服务器是否可用"""
         try:
-            response = requests.get(
-                f"{self.base_url}/ping",
-                timeout=2.0,
-                headers={'User-Agent': 'uiautomator2', 'Accept-Encoding': ''}
-            )
+            response = self._session.get(f"{self.base_url}/ping", timeout=2.0)
             if response.content != b"pong":
                 raise ConnectionError(f"Server ping failed: {response.content}")
         except Exception as e:
@@ -52,16 +299,17 @@ class U2RPCClient:
                 f"Make sure u2.jar is running on the device. Error: {e}"
             )
     
-    def _jsonrpc_call(self, method: str, params: Any = None) -> Any:
+    def _send_jsonrpc(self, method: str, params: Any = None, stream: bool = False) -> requests.Response:
         """
-        调用 JSON-RPC 方法
+        发送 JSON-RPC 请求
         
         Args:
             method: JSON-RPC 方法名
             params: 方法参数（可以是列表、字典或 None）
+            stream: 为 True 时不预先读取响应体，由调用方读入自己的缓冲区
             
         Returns:
-            JSON-RPC 响应的 result 字段
+            HTTP 响应
         """
         # 构建 JSON-RPC 2.0 请求
         payload = {
@@ -71,44 +319,76 @@ class U2RPCClient:
             "params": params if params is not None else []
         }
         self._rpc_id += 1
-        
-        # 发送 HTTP POST 请求
-        headers = {
-            'User-Agent': 'uiautomator2',
-            'Accept-Encoding': '',  # 避免 gzip 压缩（nanohttpd 有资源泄漏问题）
-            'Content-Type': 'application/json'
-        }
-        
+        return self._post_body(_json_dumps(payload), self._rpc_headers, stream)
+    
+    def _post_body(self, body: bytes, headers: Dict[str, str], stream: bool = False) -> requests.Response:
+        """发送已序列化好的 JSON-RPC 请求体"""
         try:
-            response = requests.post(
-                f"{self.base_url}/jsonrpc/0",
-                json=payload,
+            # 发送 HTTP POST 请求（公共请求头已在 Session 中预置）
+            response = self._session.post(
+                self._jsonrpc_url,
+                data=body,
                 headers=headers,
-                timeout=self.timeout
+                timeout=self.timeout,
+                stream=stream
             )
             response.raise_for_status()
-            
-            # 解析 JSON 响应
-            data = response.json()
-            
-            # 检查错误
-            if "error" in data:
-                error = data["error"]
-                code = error.get('code', -1)
-                message = error.get('message', 'Unknown error')
-                raise RuntimeError(f"JSON-RPC error [{code}]: {message}")
-            
-            # 返回结果
-            if "result" not in data:
-                raise RuntimeError("JSON-RPC response missing 'result' field")
-            
-            return data["result"]
-            
+            return response
         except requests.exceptions.Timeout:
             raise TimeoutError(f"Request timeout after {self.timeout}s")
         except requests.exceptions.RequestException as e:
             raise ConnectionError(f"HTTP request failed: {e}")
     
+    def _post_jsonrpc(self, method: str, params: Any = None) -> bytes:
+        """发送 JSON-RPC 请求，返回未解析的响应内容"""
+        return self._send_jsonrpc(method, params).content
+    
+    def _screenshot_body(self, scale: float, quality: int) -> bytes:
+        """
+        生成 takeScreenshot 请求体
+        
+        同一组参数的请求只有 id 不同，其余部分序列化一次后缓存，每帧只拼接 id
+        """
+        key = (scale, quality)
+        prefix = self._screenshot_prefixes.get(key)
+        if prefix is None:
+            prefix = b'{"jsonrpc":"2.0","method":"takeScreenshot","params":' + _json_dumps([scale, quality]) + b',"id":'
+            self._screenshot_prefixes[key] = prefix
+        rpc_id = self._rpc_id
+        self._rpc_id += 1
+        return b'%s%d}' % (prefix, rpc_id)
+    
+    @staticmethod
+    def _parse_result(content: bytes) -> Any:
+        """解析 JSON-RPC 响应，返回 result 字段"""
+        data = _json_loads(content)
+        
+        # 检查错误
+        if "error" in data:
+            error = data["error"]
+            code = error.get('code', -1)
+            message = error.get('message', 'Unknown error')
+            raise RuntimeError(f"JSON-RPC error [{code}]: {message}")
+        
+        # 返回结果
+        if "result" not in data:
+            raise RuntimeError("JSON-RPC response missing 'result' field")
+        
+        return data["result"]
+    
+    def _jsonrpc_call(self, method: str, params: Any = None) -> Any:
+        """
+        调用 JSON-RPC 方法
+        
+        Args:
+            method: JSON-RPC 方法名
+            params: 方法参数（可以是列表、字典或 None）
+            
+        Returns:
+            JSON-RPC 响应的 result 字段
+        """
+        return self._parse_result(self._post_jsonrpc(method, params))
+    
     def take_screenshot(self, scale: float = 1.0, quality: int = 80) -> Optional[str]:
         """
         截取屏幕截图
@@ -127,6 +407,95 @@ class U2RPCClient:
             print(f"Screenshot failed: {e}")
             return None
     
+    def _probe_raw_screenshot(self) -> bool:
+        """检查服务端是否提供直接返回 image/jpeg 的 /screenshot/0 接口"""
+        try:
+            response = self._session.get(self._screenshot_url, headers=self._binary_headers, timeout=self.timeout)
+        except requests.exceptions.RequestException:
+            return False
+        return response.status_code == 200 and \
+            response.headers.get('Content-Type', '').startswith('image/jpeg')
+    
+    def take_screenshot_jpeg(self, scale: float = 1.0, quality: int = 80,
+                             buf: Optional[bytearray] = None) -> Optional[Union[bytes, memoryview]]:
+        """
+        截取屏幕截图，直接返回 JPEG 数据，避免 base64 字符串和 JSON 解析的开销
+        
+        服务端提供 /screenshot/0 时直接下载 JPEG（该接口不支持 scale/quality 参数），
+        否则使用 takeScreenshot，并从响应中直接截取 base64 数据解码
+        
+        Args:
+            scale: 缩放比例（1.0 = 100%, 0.5 = 50%, 2.0 = 200%）
+            quality: JPEG 压缩质量（0-100，80 表示 80% 质量）
+            buf: 可复用的接收缓冲区，响应体直接读入其中，不再为每帧分配新的 bytes
+            
+        Returns:
+            JPEG 图片数据，失败返回 None。传入 buf 时可能是指向 buf 的 memoryview，
+            调用方用完后需要先 release() 才能再次复用 buf
+        """
+        if self._raw_screenshot is None:
+            self._raw_screenshot = self._probe_raw_screenshot()
+        try:
+            if self._raw_screenshot:
+                response = self._session.get(self._screenshot_url, headers=self._binary_headers,
+                                             timeout=self.timeout, stream=buf is not None)
+                response.raise_for_status()
+                if buf is None:
+                    return response.content
+                return memoryview(buf)[:_read_body(response, buf)]
+            
+            body = self._screenshot_body(scale, quality)
+            if buf is None:
+                content = self._post_body(body, self._binary_headers).content
+                size = len(content)
+            else:
+                content = buf
+                size = _read_body(self._post_body(body, self._binary_headers, stream=True), buf)
+            base64_data = _extract_base64_result(content, size)
+            if base64_data is None:
+                # 出现错误或包含转义字符时，按普通 JSON-RPC 响应处理
+                base64_data = self._parse_result(content[:size])
+                if not base64_data:
+                    return None
+                return b64decode(base64_data)
+            with base64_data:
+                return b64decode(base64_data)
+        except Exception as e:
+            print(f"Screenshot failed: {e}")
+            return None
+    
+    def iter_stream_jpeg(self, running: threading.Event):
+        """
+        通过 atx-agent 的 /minicap WebSocket 持续接收 JPEG 帧
+        
+        设备按编码速度主动推送，不再需要每帧一次请求往返
+        
+        Args:
+            running: 被清除后停止接收
+        
+        Raises:
+            ConnectionError: 未安装 websocket-client 或设备没有提供该接口
+        """
+        if _ws_connect is None:
+            raise ConnectionError("websocket-client is not installed")
+        try:
+            ws = _ws_connect(f"ws://{self.host}:{self.stream_port}/minicap", timeout=self.timeout)
+        except Exception as e:
+            raise ConnectionError(f"Screen stream unavailable: {e}")
+        # 屏幕静止时 minicap 不推送帧，接收超时只表示没有新帧，不代表流已断开；
+        # 短超时让 running 被清除后能及时退出，只有连接错误或关闭才回退到逐帧截图
+        ws.settimeout(1.0)
+        try:
+            while running.is_set():
+                try:
+                    msg = ws.recv()
+                except WebSocketTimeoutException:
+                    continue
+                if isinstance(msg, bytes):  # 文本消息是 minicap 的状态信息
+                    yield msg
+        finally:
+            ws.close()
+    
     def device_info(self) -> dict:
         """
         获取设备信息
@@ -134,7 +503,17 @@ class U2RPCClient:
         Returns:
             设备信息字典
         """
-        return self._jsonrpc_call("deviceInfo")
+        info = self._jsonrpc_call("deviceInfo")
+        self._display_size = (info.get('displayWidth', 1080), info.get('displayHeight', 2240))
+        return info
+    
+    def display_size(self, refresh: bool = False) -> Tuple[int, int]:
+        """
+        获取屏幕尺寸 (width, height)，会话期间不变，只在第一次或 refresh=True 时请求设备
+        """
+        if refresh or self._display_size is None:
+            self.device_info()
+        return self._display_size
     
     def click(self, x: int, y: int) -> bool:
         """
@@ -204,10 +583,8 @@ class U2RPCClient:
         Returns:
             成功返回 True，失败返回 False
         """
-        # 获取设备尺寸
-        info = self.device_info()
-        device_w = info.get('displayWidth', 1080)
-        device_h = info.get('displayHeight', 2240)
+        # 获取设备尺寸（使用缓存，滚轮每一格不必再多一次 deviceInfo 请求）
+        device_w, device_h = self.display_size()
         
         # 确定滑动区域
         if box:
@@ -273,11 +650,9 @@ def main():
         print(f"获取设备信息失败: {e}")
         # 尝试从截图获取尺寸
         try:
-            base64_data = client.take_screenshot(1.0, 80)
-            if base64_data:
-                jpg_raw = base64.b64decode(base64_data)
-                nparr = np.frombuffer(jpg_raw, np.uint8)
-                test_img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            jpg_raw = client.take_screenshot_jpeg(1.0, 80)
+            if jpg_raw:
+                test_img = decode_jpeg(jpg_raw)
                 if test_img is not None:
                     screen_height, screen_width = test_img.shape[:2]
                     print(f"从截图获取设备尺寸: {screen_width}x{screen_height}")
@@ -322,21 +697,26 @@ def main():
     # 性能优化参数
     SCREENSHOT_QUALITY = 50  # 降低质量到50，减少传输数据量
     SCREENSHOT_SCALE = 0.8   # 使用0.8倍缩放，进一步减少数据量
-    QUEUE_SIZE = 1           # 队列大小设为1，只保留最新帧，减少内存占用
+    WINDOW_CHECK_INTERVAL = 0.1  # 窗口状态检查间隔（秒）
+    DISPLAY_CPU = 0  # 显示（主）线程绑定的 CPU
+    DECODE_CPU = 2   # 解码线程绑定的 CPU，和显示线程错开，超线程机器上通常落在另一个物理核
     
-    # 使用队列进行多线程处理
-    screenshot_queue = Queue(maxsize=QUEUE_SIZE)
+    # 抓取 → 解码 → 显示 三级流水线，网络等待、JPEG 解码和窗口绘制互相重叠
+    raw_queue = Queue(maxsize=2)  # 有界队列提供背压
+    # 接收缓冲池：队列中 2 个 + 抓取、解码线程各持有 1 个，稳态下不再分配新的缓冲区
+    free_buffers = Queue()
+    for _ in range(raw_queue.maxsize + 2):
+        free_buffers.put(bytearray(512 * 1024))
+    frames = FrameBuffer()        # 解码线程与显示线程之间只交换最新一帧
     running = threading.Event()
     running.set()
     
     frame_count = 0
-    start_time = time.time()
-    last_fps_update = time.time()
+    start_time = time.monotonic()
+    last_fps_update = start_time
     current_fps = 0.0
-    
-    # 坐标转换相关变量（需要在回调中使用）
-    current_screenshot = None  # 当前显示的截图
-    screenshot_lock = threading.Lock()  # 保护共享变量的锁
+    fps_overlay: Optional[TextOverlay] = None  # FPS 只在数值更新时重新渲染
+    help_overlay = TextOverlay("左键点击 | 右键返回 | 滚轮滚动 | 按'q'退出", 0.5, (255, 255, 255), 1)
     
     def mouse_callback(event, x, y, flags, param):
         """鼠标事件回调函数"""
@@ -366,83 +746,145 @@ def main():
     # 设置鼠标回调
     cv2.setMouseCallback(window_name, mouse_callback)
     
-    def screenshot_thread():
-        """截图线程，持续获取截图"""
+    def recycle(item):
+        """释放指向接收缓冲的 memoryview，并把缓冲区还给缓冲池"""
+        buf, jpg_raw = item
+        if isinstance(jpg_raw, memoryview):
+            jpg_raw.release()
+        if buf is not None:
+            free_buffers.put(buf)
+    
+    def submit(item):
+        """交给解码线程，解码跟不上时在这里等待（背压），同时响应退出"""
         while running.is_set():
             try:
-                # 截屏（优化：降低质量和尺寸）
-                base64_data = client.take_screenshot(SCREENSHOT_SCALE, SCREENSHOT_QUALITY)
-                if base64_data:
-                    # 直接使用 cv2.imdecode，比 PIL + image_convert 更快
-                    jpg_raw = base64.b64decode(base64_data)
-                    # 使用 cv2.imdecode 直接解码为 numpy 数组
-                    nparr = np.frombuffer(jpg_raw, np.uint8)
-                    screenshot = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-                    
-                    if screenshot is not None:
-                        # 如果队列满了，丢弃最旧的帧（保持最新）
-                        if screenshot_queue.full():
-                            try:
-                                screenshot_queue.get_nowait()
-                            except:
-                                pass
-                        screenshot_queue.put(screenshot, timeout=0.05)
-                else:
-                    time.sleep(0.005)  # 减少等待时间
+                raw_queue.put(item, timeout=0.1)
+                return
+            except Full:
+                pass
+        recycle(item)
+    
+    def fetch_thread():
+        """抓取线程，持续获取 JPEG 数据"""
+        # 优先使用设备推送的截图流，不可用或断开时回退到逐帧请求
+        try:
+            for jpg_raw in client.iter_stream_jpeg(running):
+                submit((None, jpg_raw))
+        except Exception as e:
+            if running.is_set():
+                print(f"截图流不可用，改为逐帧截图: {e}")
+        while running.is_set():
+            try:
+                buf = free_buffers.get(timeout=0.1)
+            except Empty:
+                continue
+            try:
+                # 截屏（优化：降低质量和尺寸），响应直接读入复用的缓冲区
+                jpg_raw = client.take_screenshot_jpeg(SCREENSHOT_SCALE, SCREENSHOT_QUALITY, buf=buf)
             except Exception:
-                time.sleep(0.005)
+                jpg_raw = None
+            if not jpg_raw:
+                free_buffers.put(buf)
+                time.sleep(0.005)  # 减少等待时间
+                continue
+            submit((buf, jpg_raw))
     
-    # 启动截图线程
-    screenshot_thread_obj = threading.Thread(target=screenshot_thread, daemon=True)
-    screenshot_thread_obj.start()
+    def decode_thread():
+        """解码线程，把 JPEG 解码到预分配的缓冲中"""
+        pin_current_thread(DECODE_CPU)
+        get_nowait = raw_queue.get_nowait
+        decode_errors = 0
+        while running.is_set():
+            # 显示线程还没取走上一帧时先不解码，之后只解码队列中最新的一帧，
+            # 跳过的中间帧不再做 IDCT（显示跟不上时大部分解码都可以省掉）
+            if not frames.wait_consumer_ready(0.1):
+                continue
+            item = None
+            try:
+                item = raw_queue.get(timeout=0.1)
+                while True:
+                    newer = get_nowait()
+                    recycle(item)
+                    item = newer
+            except Empty:
+                pass
+            if item is None:
+                continue
+            try:
+                # 直接解码为 BGR numpy 数组（优先 libjpeg-turbo）
+                screenshot = decode_jpeg(item[1], dst=frames.back_buffer())
+                if screenshot is not None:
+                    # 提交给显示线程
+                    frames.publish(screenshot)
+            except Exception:
+                # 偶尔的损坏帧直接跳过；只打印第一次的异常堆栈，避免刷屏又不会把解码 bug 完全隐藏
+                decode_errors += 1
+                if decode_errors == 1:
+                    print("解码失败（之后的解码异常不再输出）:")
+                    traceback.print_exc()
+            finally:
+                recycle(item)
+    
+    # 启动抓取、解码线程，主线程只负责显示
+    # （imshow/waitKey 不放到子线程：Qt、Cocoa 等 HighGUI 后端只允许在主线程操作窗口）
+    worker_threads = [
+        threading.Thread(target=fetch_thread, name="fetch", daemon=True),
+        threading.Thread(target=decode_thread, name="decode", daemon=True),
+    ]
+    for t in worker_threads:
+        t.start()
+    # 在子线程启动之后再绑定主线程，新线程会继承创建者的 CPU 亲和性
+    pin_current_thread(DISPLAY_CPU)
     
+    # 主循环每帧都要调用的函数先绑定到局部变量，省去每次的全局/属性查找
+    take_frame = frames.take
+    imshow = cv2.imshow
+    wait_key = cv2.waitKey
+    monotonic = time.monotonic
+    get_window_property = cv2.getWindowProperty
+    WND_PROP_VISIBLE = cv2.WND_PROP_VISIBLE
+    
+    display_errors = 0
     try:
         window_initialized = False  # 标记窗口是否已经显示过内容
+        next_window_check = 0.0
         while True:
             try:
-                # 从队列获取最新截图（非阻塞）
-                screenshot = None
-                try:
-                    screenshot = screenshot_queue.get_nowait()
-                except:
-                    pass
+                # 获取最新截图，没有新帧时短暂等待，避免空转（同时保证 waitKey 能及时处理窗口事件）
+                screenshot = take_frame(0.01)
                 
                 if screenshot is not None:
                     frame_count += 1
                     window_initialized = True  # 窗口已经显示过内容
                     
-                    # 更新当前截图（用于坐标转换）
-                    with screenshot_lock:
-                        current_screenshot = screenshot.copy()
-                    
                     # 每0.5秒更新一次FPS显示
-                    now = time.time()
+                    now = monotonic()
                     if now - last_fps_update >= 0.5:
                         elapsed = now - start_time
                         if elapsed > 0:
                             current_fps = frame_count / elapsed
+                            fps_overlay = TextOverlay(f"FPS: {current_fps:.1f}", 0.7, (0, 255, 0), 2)
                         last_fps_update = now
                     
-                    # 显示FPS和提示信息（直接在原图上绘制）
-                    display_img = screenshot.copy()
-                    if current_fps > 0:
-                        cv2.putText(display_img, f"FPS: {current_fps:.1f}", (10, 30),
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                    cv2.putText(display_img, "左键点击 | 右键返回 | 滚轮滚动 | 按'q'退出", (10, display_img.shape[0] - 10),
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+                    # 显示FPS和提示信息（直接在原图上绘制，这一帧只用于显示）
+                    if fps_overlay is not None:
+                        fps_overlay.draw(screenshot, (10, 30))
+                    help_overlay.draw(screenshot, (10, screenshot.shape[0] - 10))
                     
                     # 显示图片
-                    cv2.imshow(window_name, display_img)
+                    imshow(window_name, screenshot)
                 
                 # 检查按键和窗口状态
                 # 注意：cv2.waitKey() 在窗口刚创建时也会返回 -1，所以需要先显示内容后再检查
-                key = cv2.waitKey(1)
-                if window_initialized:
+                key = wait_key(1)
+                now = monotonic()
+                if window_initialized and now >= next_window_check:
                     # 只有在窗口已经显示过内容后，才检查窗口是否关闭
-                    # 使用 getWindowProperty 更可靠地检测窗口关闭
+                    # 使用 getWindowProperty 更可靠地检测窗口关闭（要跨越到 GUI 后端，最多每 100ms 检查一次）
+                    next_window_check = now + WINDOW_CHECK_INTERVAL
                     try:
-                        window_prop = cv2.getWindowProperty(window_name, cv2.WND_PROP_VISIBLE)
-                        if window_prop is None or (isinstance(window_prop, (int, float)) and window_prop <= 0):
+                        # getWindowProperty 总是返回 float，窗口关闭后为 -1 或 0
+                        if get_window_property(window_name, WND_PROP_VISIBLE) <= 0:
                             print("检测到窗口已关闭")
                             break
                     except Exception:
@@ -457,13 +899,17 @@ def main():
                 
             except KeyboardInterrupt:
                 break
-            except Exception:
-                pass  # 静默处理异常，不输出
+            except cv2.error as e:
+                # 只容忍 HighGUI 窗口相关的 cv2 错误，第一次时输出；其它异常（如绘制 bug）直接抛出
+                display_errors += 1
+                if display_errors == 1:
+                    print(f"显示失败（之后的显示异常不再输出）: {e}")
                 
     finally:
-        # 停止截图线程
+        # 停止抓取、解码线程
         running.clear()
-        screenshot_thread_obj.join(timeout=1.0)
+        for t in worker_threads:
+            t.join(timeout=1.0)
         # 关闭窗口
         try:
             cv2.destroyWindow(window_name)
@@ -6,7 +6,9 @@
 
 import sys
 import os
-import traceback
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import List
 
 # 添加项目根目录到 Python 路径
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -14,514 +16,222 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import uiautomator2 as u2
 
 
-def test_interface(name, func, *args, **kwargs):
-    """测试接口是否可用"""
-    try:
-        result = func(*args, **kwargs)
-        return True, result, None
-    except Exception as e:
-        return False, None, str(e)
+OK, PARTIAL, FAIL = "可用", "部分可用", "不可用"
+TAGS = {OK: "[OK]", PARTIAL: "[WARN]", FAIL: "[FAIL]"}
+
+
+@dataclass
+class Results:
+    """按状态归类的接口名称，顺序即探测顺序"""
+    ok: List[str] = field(default_factory=list)
+    partial: List[str] = field(default_factory=list)
+    fail: List[str] = field(default_factory=list)
+
+    @property
+    def total(self) -> int:
+        return len(self.ok) + len(self.partial) + len(self.fail)
+
+
+def probe(name, func, check):
+    """
+    生成一个探测函数：调用 func，用 check 把返回值转换为 (状态, 说明)，抛出异常视为不可用
+
+    探测函数返回 [(名称, 状态, 说明)]，一次探测可以得到多条结果（如批量 JSON-RPC）
+    """
+    def run():
+        try:
+            status, text = check(func())
+        except Exception as e:
+            status, text = FAIL, str(e)
+        return [(name, status, text)]
+    return run
+
+
+def exists_check(exists):
+    return (OK, "接口存在") if exists else (FAIL, "接口不存在")
+
+
+def probe_exists(attrs, name):
+    """只检查接口是否存在，不实际调用；attrs 为 dir() 的快照，避免反复 hasattr 触发 __getattr__"""
+    # 集合查找不会抛异常，不需要 probe 的 try 包装
+    return lambda: [(name, *exists_check(name in attrs))]
+
+
+# 只读的 JSON-RPC 接口，合并成一次批量请求实际调用
+JSONRPC_PROBES = {
+    "deviceInfo": lambda b: b.deviceInfo(),
+    "dumpWindowHierarchy": lambda b: b.dumpWindowHierarchy(False, 50),
+}
+# 会改变设备状态的 JSON-RPC 接口，只检查是否存在，不实际调用
+JSONRPC_EXISTS_ONLY = ("click", "swipe", "press", "objInfo")
+
+
+def non_empty(text_ok, text_empty="返回空"):
+    """返回值非空为可用，否则为部分可用"""
+    return lambda result: (OK, text_ok(result)) if result else (PARTIAL, text_empty)
 
 
 def main():
     device_address = "192.168.25.22:9008"
-    
+
     print("=" * 60)
     print("WiFi 模式接口可用性测试")
     print("=" * 60)
     print(f"\n正在连接设备: {device_address}")
-    
+
     try:
         d = u2.connect_wifi(device_address)
         print("[OK] 连接成功！\n")
     except Exception as e:
         print(f"[FAIL] 连接失败: {e}")
         return
-    
-    results = {
-        "可用": [],
-        "不可用": [],
-        "部分可用": []
-    }
-    
-    # ========== 基础信息接口 ==========
-    print("\n【基础信息接口】")
-    print("-" * 60)
-    
-    # info
-    success, result, error = test_interface("info", lambda: d.info)
-    if success:
-        print(f"[OK] info: {result.get('displayWidth', 'N/A')}x{result.get('displayHeight', 'N/A')}")
-        results["可用"].append("info")
-    else:
-        print(f"[FAIL] info: {error}")
-        results["不可用"].append("info")
-    
-    # device_info
-    success, result, error = test_interface("device_info", lambda: d.device_info)
-    if success:
-        print(f"[OK] device_info: {result}")
-        results["可用"].append("device_info")
-    else:
-        print(f"[FAIL] device_info: {error}")
-        results["不可用"].append("device_info")
-    
-    # wlan_ip
-    success, result, error = test_interface("wlan_ip", lambda: d.wlan_ip)
-    if success:
-        print(f"[OK] wlan_ip: {result}")
-        results["可用"].append("wlan_ip")
-    else:
-        print(f"[FAIL] wlan_ip: {error}")
-        results["不可用"].append("wlan_ip")
-    
-    # window_size
-    success, result, error = test_interface("window_size", lambda: d.window_size())
-    if success:
-        print(f"[OK] window_size: {result}")
-        results["可用"].append("window_size")
-    else:
-        print(f"[FAIL] window_size: {error}")
-        results["不可用"].append("window_size")
-    
-    # ========== 截图接口 ==========
-    print("\n【截图接口】")
-    print("-" * 60)
-    
-    # screenshot
-    success, result, error = test_interface("screenshot", lambda: d.screenshot(format='opencv'))
-    if success and result is not None:
-        print(f"[OK] screenshot: {result.shape if hasattr(result, 'shape') else 'OK'}")
-        results["可用"].append("screenshot")
-    else:
-        print(f"[FAIL] screenshot: {error}")
-        results["不可用"].append("screenshot")
-    
-    # takeScreenshot (JSON-RPC)
-    try:
-        result = d.jsonrpc.takeScreenshot(1, 80)
-        if result:
-            print(f"[OK] jsonrpc.takeScreenshot: OK (返回 {len(result)} 字符)")
-            results["可用"].append("jsonrpc.takeScreenshot")
-        else:
-            print(f"[WARN] jsonrpc.takeScreenshot: 返回 None")
-            results["部分可用"].append("jsonrpc.takeScreenshot")
-    except Exception as e:
-        print(f"[FAIL] jsonrpc.takeScreenshot: {e}")
-        results["不可用"].append("jsonrpc.takeScreenshot")
-    
-    # ========== UI 操作接口 ==========
-    print("\n【UI 操作接口】")
-    print("-" * 60)
-    
-    # click
-    try:
-        # 只测试接口是否存在，不实际点击
-        if hasattr(d, 'click'):
-            print("[OK] click: 接口存在")
-            results["可用"].append("click")
-        else:
-            print("[FAIL] click: 接口不存在")
-            results["不可用"].append("click")
-    except Exception as e:
-        print(f"[FAIL] click: {e}")
-        results["不可用"].append("click")
-    
-    # swipe
-    try:
-        if hasattr(d, 'swipe'):
-            print("[OK] swipe: 接口存在")
-            results["可用"].append("swipe")
-        else:
-            print("[FAIL] swipe: 接口不存在")
-            results["不可用"].append("swipe")
-    except Exception as e:
-        print(f"[FAIL] swipe: {e}")
-        results["不可用"].append("swipe")
-    
-    # press
-    try:
-        if hasattr(d, 'press'):
-            print("[OK] press: 接口存在")
-            results["可用"].append("press")
-        else:
-            print("[FAIL] press: 接口不存在")
-            results["不可用"].append("press")
-    except Exception as e:
-        print(f"[FAIL] press: {e}")
-        results["不可用"].append("press")
-    
-    # long_click
-    try:
-        if hasattr(d, 'long_click'):
-            print("[OK] long_click: 接口存在")
-            results["可用"].append("long_click")
-        else:
-            print("[FAIL] long_click: 接口不存在")
-            results["不可用"].append("long_click")
-    except Exception as e:
-        print(f"[FAIL] long_click: {e}")
-        results["不可用"].append("long_click")
-    
-    # double_click
-    try:
-        if hasattr(d, 'double_click'):
-            print("[OK] double_click: 接口存在")
-            results["可用"].append("double_click")
-        else:
-            print("[FAIL] double_click: 接口不存在")
-            results["不可用"].append("double_click")
-    except Exception as e:
-        print(f"[FAIL] double_click: {e}")
-        results["不可用"].append("double_click")
-    
-    # ========== 文本输入接口 ==========
-    print("\n【文本输入接口】")
-    print("-" * 60)
-    
-    # send_keys
-    try:
-        if hasattr(d, 'send_keys'):
-            print("[OK] send_keys: 接口存在")
-            results["可用"].append("send_keys")
-        else:
-            print("[FAIL] send_keys: 接口不存在")
-            results["不可用"].append("send_keys")
-    except Exception as e:
-        print(f"[FAIL] send_keys: {e}")
-        results["不可用"].append("send_keys")
-    
-    # clear_text
-    try:
-        if hasattr(d, 'clear_text'):
-            print("[OK] clear_text: 接口存在")
-            results["可用"].append("clear_text")
-        else:
-            print("[FAIL] clear_text: 接口不存在")
-            results["不可用"].append("clear_text")
-    except Exception as e:
-        print(f"[FAIL] clear_text: {e}")
-        results["不可用"].append("clear_text")
-    
-    # ========== Shell 接口 ==========
-    print("\n【Shell 接口】")
-    print("-" * 60)
-    
-    # shell (需要 root)
-    success, result, error = test_interface("shell", lambda: d.shell("echo test"))
-    if success:
-        print(f"[OK] shell: {result.output[:50] if result else 'OK'}")
-        results["可用"].append("shell")
-    else:
-        print(f"[FAIL] shell: {error}")
-        results["不可用"].append("shell")
-    
-    # superShell (JSON-RPC)
-    try:
-        result = d.jsonrpc.superShell("echo test")
-        if result:
-            print(f"[OK] jsonrpc.superShell: OK")
-            results["可用"].append("jsonrpc.superShell")
-        else:
-            print(f"[WARN] jsonrpc.superShell: 返回空")
-            results["部分可用"].append("jsonrpc.superShell")
-    except Exception as e:
-        print(f"[FAIL] jsonrpc.superShell: {e}")
-        results["不可用"].append("jsonrpc.superShell")
-    
-    # ========== UI 选择器接口 ==========
-    print("\n【UI 选择器接口】")
-    print("-" * 60)
-    
-    # d(text=...)
-    try:
-        selector = d(text="test")
+
+    # 一次性取属性快照，后续存在性检查都是集合查找
+    d_attrs = frozenset(dir(d))
+    rpc = d.jsonrpc
+
+    results = Results()
+    by_status = {OK: results.ok, PARTIAL: results.partial, FAIL: results.fail}
+
+    def report(lines):
+        for name, status, text in lines:
+            print(f"{TAGS[status]} {name}: {text}")
+            by_status[status].append(name)
+
+    def probe_jsonrpc_batch():
+        """只读接口合并为一次 JSON-RPC 批量请求，一个往返拿到全部结果"""
+        try:
+            with rpc.batch(return_exceptions=True) as b:
+                for queue_call in JSONRPC_PROBES.values():
+                    queue_call(b)
+            batch_results = b.results
+        except Exception as e:
+            batch_results = [e] * len(JSONRPC_PROBES)
+        lines = []
+        for method, result in zip(JSONRPC_PROBES, batch_results):
+            name = "jsonrpc." + method
+            if isinstance(result, Exception):
+                lines.append((name, FAIL, str(result)))
+            elif result:
+                lines.append((name, OK, "OK"))
+            else:
+                lines.append((name, PARTIAL, "返回空"))
+        return lines
+
+    def probe_jsonrpc_exists():
+        # jsonrpc 的方法由 __getattr__ 动态生成，dir() 里没有，只能用 hasattr
+        return [("jsonrpc." + method, *exists_check(hasattr(rpc, method))) for method in JSONRPC_EXISTS_ONLY]
+
+    def check_selector(selector):
         # UiObject 总是会被创建，即使元素不存在，所以检查它是否有必要的方法
         if hasattr(selector, 'exists') and hasattr(selector, 'click'):
-            print("[OK] d(text=...): 接口存在")
-            results["可用"].append("selector")
-        else:
-            print("[FAIL] d(text=...): 接口不完整")
-            results["不可用"].append("selector")
-    except Exception as e:
-        print(f"[FAIL] d(text=...): {e}")
-        results["不可用"].append("selector")
-    
-    # ========== 应用管理接口 ==========
-    print("\n【应用管理接口】")
-    print("-" * 60)
-    
-    # app_current
-    try:
-        result = d.app_current()
-        if result:
-            print(f"[OK] app_current: {result.get('package', 'N/A')}")
-            results["可用"].append("app_current")
-        else:
-            print("[WARN] app_current: 返回 None")
-            results["部分可用"].append("app_current")
-    except Exception as e:
-        print(f"[FAIL] app_current: {e}")
-        results["不可用"].append("app_current")
-    
-    # app_list_running
-    try:
-        result = d.app_list_running()
-        if result:
-            print(f"[OK] app_list_running: {len(result)} 个应用")
-            results["可用"].append("app_list_running")
-        else:
-            print("[WARN] app_list_running: 返回空")
-            results["部分可用"].append("app_list_running")
-    except Exception as e:
-        print(f"[FAIL] app_list_running: {e}")
-        results["不可用"].append("app_list_running")
-    
-    # ========== 屏幕操作接口 ==========
-    print("\n【屏幕操作接口】")
-    print("-" * 60)
-    
-    # screen_on
-    try:
-        if hasattr(d, 'screen_on'):
-            print("[OK] screen_on: 接口存在")
-            results["可用"].append("screen_on")
-        else:
-            print("[FAIL] screen_on: 接口不存在")
-            results["不可用"].append("screen_on")
-    except Exception as e:
-        print(f"[FAIL] screen_on: {e}")
-        results["不可用"].append("screen_on")
-    
-    # screen_off
-    try:
-        if hasattr(d, 'screen_off'):
-            print("[OK] screen_off: 接口存在")
-            results["可用"].append("screen_off")
-        else:
-            print("[FAIL] screen_off: 接口不存在")
-            results["不可用"].append("screen_off")
-    except Exception as e:
-        print(f"[FAIL] screen_off: {e}")
-        results["不可用"].append("screen_off")
-    
-    # orientation
-    try:
-        result = d.orientation
-        print(f"[OK] orientation: {result}")
-        results["可用"].append("orientation")
-    except Exception as e:
-        print(f"[FAIL] orientation: {e}")
-        results["不可用"].append("orientation")
-    
-    # dump_hierarchy
-    success, result, error = test_interface("dump_hierarchy", lambda: d.dump_hierarchy(compressed=True))
-    if success and result:
-        print(f"[OK] dump_hierarchy: OK (长度: {len(result)} 字符)")
-        results["可用"].append("dump_hierarchy")
-    else:
-        print(f"[FAIL] dump_hierarchy: {error}")
-        results["不可用"].append("dump_hierarchy")
-    
-    # open_notification
-    try:
-        if hasattr(d, 'open_notification'):
-            print("[OK] open_notification: 接口存在")
-            results["可用"].append("open_notification")
-        else:
-            print("[FAIL] open_notification: 接口不存在")
-            results["不可用"].append("open_notification")
-    except Exception as e:
-        print(f"[FAIL] open_notification: {e}")
-        results["不可用"].append("open_notification")
-    
-    # open_quick_settings
-    try:
-        if hasattr(d, 'open_quick_settings'):
-            print("[OK] open_quick_settings: 接口存在")
-            results["可用"].append("open_quick_settings")
-        else:
-            print("[FAIL] open_quick_settings: 接口不存在")
-            results["不可用"].append("open_quick_settings")
-    except Exception as e:
-        print(f"[FAIL] open_quick_settings: {e}")
-        results["不可用"].append("open_quick_settings")
-    
-    # ========== JSON-RPC 接口测试 ==========
-    print("\n【JSON-RPC 接口测试】")
-    print("-" * 60)
-    
-    jsonrpc_methods = [
-        "deviceInfo",
-        "click",
-        "swipe",
-        "press",
-        "dumpWindowHierarchy",
-        "objInfo",
+            return OK, "d(text=...) 接口存在"
+        return FAIL, "d(text=...) 接口不完整"
+
+    # 互不依赖的探测并发执行，总耗时接近最慢的一个请求而不是所有请求之和
+    sections = [
+        ("基础信息接口", [
+            probe("info", lambda: d.info,
+                  lambda r: (OK, f"{r.get('displayWidth', 'N/A')}x{r.get('displayHeight', 'N/A')}")),
+            probe("device_info", lambda: d.device_info, lambda r: (OK, r)),
+            probe("wlan_ip", lambda: d.wlan_ip, lambda r: (OK, r)),
+            probe("window_size", lambda: d.window_size(), lambda r: (OK, r)),
+        ]),
+        ("UI 操作接口", [
+            # 只测试接口是否存在，不实际点击
+            probe_exists(d_attrs, name) for name in ["click", "swipe", "press", "long_click", "double_click"]
+        ]),
+        ("文本输入接口", [
+            probe_exists(d_attrs, name) for name in ["send_keys", "clear_text"]
+        ]),
+        ("UI 选择器接口", [
+            probe("selector", lambda: d(text="test"), check_selector),
+        ]),
+        ("应用管理接口", [
+            probe("app_current", lambda: d.app_current(),
+                  non_empty(lambda r: r.get('package', 'N/A'), "返回 None")),
+            probe("app_list_running", lambda: d.app_list_running(),
+                  non_empty(lambda r: f"{len(r)} 个应用")),
+        ]),
+        ("屏幕操作接口", [
+            probe_exists(d_attrs, "screen_on"),
+            probe_exists(d_attrs, "screen_off"),
+            probe("orientation", lambda: d.orientation, lambda r: (OK, r)),
+            probe("dump_hierarchy", lambda: d.dump_hierarchy(compressed=True),
+                  lambda r: (OK, f"OK (长度: {len(r)} 字符)") if r else (FAIL, None)),
+            probe_exists(d_attrs, "open_notification"),
+            probe_exists(d_attrs, "open_quick_settings"),
+        ]),
+        ("JSON-RPC 接口测试", [
+            probe_jsonrpc_batch,
+            probe_jsonrpc_exists,
+        ]),
+        ("插件接口", [
+            probe_exists(d_attrs, name) for name in ["xpath", "watcher", "screenrecord", "swipe_ext"]
+        ]),
+        ("其他接口测试", [
+            probe_exists(d_attrs, "drag"),
+            probe_exists(d_attrs, "unlock"),
+            probe("clipboard", lambda: d.clipboard, lambda r: (OK, r[:50] if r else 'None')),
+            probe("last_toast", lambda: d.last_toast, lambda r: (OK, r[:50] if r else 'None')),
+        ]),
     ]
-    
-    for method in jsonrpc_methods:
-        try:
-            if method == "deviceInfo":
-                result = d.jsonrpc.deviceInfo()
-                print(f"[OK] jsonrpc.{method}: OK")
-                results["可用"].append(f"jsonrpc.{method}")
-            elif method == "click":
-                # 只测试接口，不实际点击
-                if hasattr(d.jsonrpc, method):
-                    print(f"[OK] jsonrpc.{method}: 接口存在")
-                    results["可用"].append(f"jsonrpc.{method}")
-            elif method == "swipe":
-                if hasattr(d.jsonrpc, method):
-                    print(f"[OK] jsonrpc.{method}: 接口存在")
-                    results["可用"].append(f"jsonrpc.{method}")
-            elif method == "press":
-                if hasattr(d.jsonrpc, method):
-                    print(f"[OK] jsonrpc.{method}: 接口存在")
-                    results["可用"].append(f"jsonrpc.{method}")
-            elif method == "dumpWindowHierarchy":
-                try:
-                    result = d.jsonrpc.dumpWindowHierarchy(False, 50)
-                    if result:
-                        print(f"[OK] jsonrpc.{method}: OK")
-                        results["可用"].append(f"jsonrpc.{method}")
-                    else:
-                        print(f"[WARN] jsonrpc.{method}: 返回空")
-                        results["部分可用"].append(f"jsonrpc.{method}")
-                except Exception as e:
-                    print(f"[FAIL] jsonrpc.{method}: {e}")
-                    results["不可用"].append(f"jsonrpc.{method}")
-            else:
-                if hasattr(d.jsonrpc, method):
-                    print(f"[OK] jsonrpc.{method}: 接口存在")
-                    results["可用"].append(f"jsonrpc.{method}")
-        except Exception as e:
-            print(f"[FAIL] jsonrpc.{method}: {e}")
-            results["不可用"].append(f"jsonrpc.{method}")
-    
-    # ========== 插件接口 ==========
-    print("\n【插件接口】")
-    print("-" * 60)
-    
-    # xpath
-    try:
-        if hasattr(d, 'xpath'):
-            print("[OK] xpath: 接口存在")
-            results["可用"].append("xpath")
-        else:
-            print("[FAIL] xpath: 接口不存在")
-            results["不可用"].append("xpath")
-    except Exception as e:
-        print(f"[FAIL] xpath: {e}")
-        results["不可用"].append("xpath")
-    
-    # watcher
-    try:
-        if hasattr(d, 'watcher'):
-            print("[OK] watcher: 接口存在")
-            results["可用"].append("watcher")
-        else:
-            print("[FAIL] watcher: 接口不存在")
-            results["不可用"].append("watcher")
-    except Exception as e:
-        print(f"[FAIL] watcher: {e}")
-        results["不可用"].append("watcher")
-    
-    # screenrecord
-    try:
-        if hasattr(d, 'screenrecord'):
-            print("[OK] screenrecord: 接口存在")
-            results["可用"].append("screenrecord")
-        else:
-            print("[FAIL] screenrecord: 接口不存在")
-            results["不可用"].append("screenrecord")
-    except Exception as e:
-        print(f"[FAIL] screenrecord: {e}")
-        results["不可用"].append("screenrecord")
-    
-    # swipe_ext
-    try:
-        if hasattr(d, 'swipe_ext'):
-            print("[OK] swipe_ext: 接口存在")
-            results["可用"].append("swipe_ext")
-        else:
-            print("[FAIL] swipe_ext: 接口不存在")
-            results["不可用"].append("swipe_ext")
-    except Exception as e:
-        print(f"[FAIL] swipe_ext: {e}")
-        results["不可用"].append("swipe_ext")
-    
-    # ========== 其他接口测试 ==========
-    print("\n【其他接口测试】")
-    print("-" * 60)
-    
-    # drag
-    try:
-        if hasattr(d, 'drag'):
-            print("[OK] drag: 接口存在")
-            results["可用"].append("drag")
-        else:
-            print("[FAIL] drag: 接口不存在")
-            results["不可用"].append("drag")
-    except Exception as e:
-        print(f"[FAIL] drag: {e}")
-        results["不可用"].append("drag")
-    
-    # unlock
-    try:
-        if hasattr(d, 'unlock'):
-            print("[OK] unlock: 接口存在")
-            results["可用"].append("unlock")
-        else:
-            print("[FAIL] unlock: 接口不存在")
-            results["不可用"].append("unlock")
-    except Exception as e:
-        print(f"[FAIL] unlock: {e}")
-        results["不可用"].append("unlock")
-    
-    # clipboard
-    try:
-        clipboard_value = d.clipboard
-        print(f"[OK] clipboard: {clipboard_value[:50] if clipboard_value else 'None'}")
-        results["可用"].append("clipboard")
-    except Exception as e:
-        print(f"[FAIL] clipboard: {e}")
-        results["不可用"].append("clipboard")
-    
-    # last_toast
-    try:
-        toast = d.last_toast
-        print(f"[OK] last_toast: {toast[:50] if toast else 'None'}")
-        results["可用"].append("last_toast")
-    except Exception as e:
-        print(f"[FAIL] last_toast: {e}")
-        results["不可用"].append("last_toast")
-    
+    # 截图和 shell 占用设备资源较多，在并发探测结束后串行执行
+    serial_sections = [
+        ("截图接口", [
+            probe("screenshot", lambda: d.screenshot(format='opencv'),
+                  lambda r: (OK, r.shape if hasattr(r, 'shape') else 'OK') if r is not None else (FAIL, None)),
+            probe("jsonrpc.takeScreenshot", lambda: rpc.takeScreenshot(1, 80),
+                  non_empty(lambda r: f"OK (返回 {len(r)} 字符)", "返回 None")),
+        ]),
+        ("Shell 接口", [
+            # shell (需要 root)
+            probe("shell", lambda: d.shell("echo test"), lambda r: (OK, r.output[:50] if r else 'OK')),
+            probe("jsonrpc.superShell", lambda: rpc.superShell("echo test"), non_empty(lambda r: "OK")),
+        ]),
+    ]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = [(title, [executor.submit(p) for p in probes]) for title, probes in sections]
+        # 按提交顺序输出，报告顺序与并发完成的先后无关
+        for title, section_futures in futures:
+            print(f"\n【{title}】")
+            print("-" * 60)
+            for future in section_futures:
+                report(future.result())
+
+    for title, probes in serial_sections:
+        print(f"\n【{title}】")
+        print("-" * 60)
+        for p in probes:
+            report(p())
+
     # ========== 总结 ==========
     print("\n" + "=" * 60)
     print("【测试总结】")
     print("=" * 60)
-    
-    total = len(results['可用']) + len(results['部分可用']) + len(results['不可用'])
-    
-    print(f"\n[OK] 可用接口 ({len(results['可用'])}/{total}):")
-    for item in sorted(results["可用"]):
+
+    # 报告顺序固定为探测顺序，不需要再排序
+    total = results.total
+
+    print(f"\n[OK] 可用接口 ({len(results.ok)}/{total}):")
+    for item in results.ok:
         print(f"  - {item}")
-    
-    if results["部分可用"]:
-        print(f"\n[WARN] 部分可用接口 ({len(results['部分可用'])}/{total}):")
-        for item in sorted(results["部分可用"]):
+
+    if results.partial:
+        print(f"\n[WARN] 部分可用接口 ({len(results.partial)}/{total}):")
+        for item in results.partial:
             print(f"  - {item}")
-    
-    if results["不可用"]:
-        print(f"\n[FAIL] 不可用接口 ({len(results['不可用'])}/{total}):")
-        for item in sorted(results["不可用"]):
+
+    if results.fail:
+        print(f"\n[FAIL] 不可用接口 ({len(results.fail)}/{total}):")
+        for item in results.fail:
             print(f"  - {item}")
-    
+
     if total > 0:
-        available_rate = len(results['可用']) / total * 100
-        print(f"\n可用率: {available_rate:.1f}% ({len(results['可用'])}/{total})")
-    
+        available_rate = len(results.ok) / total * 100
+        print(f"\n可用率: {available_rate:.1f}% ({len(results.ok)}/{total})")
+
     print("\n" + "=" * 60)
     print("测试完成！")
     print("=" * 60)
@@ -529,4 +239,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
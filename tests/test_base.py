@@ -0,0 +1,162 @@
+# coding: utf-8
+#
+
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+
+from uiautomator2._proto import HTTP_TIMEOUT
+from uiautomator2.base import INFO_CACHE_TTL, JSONRpcBatch, JSONRpcWrapper, _BaseClient
+from uiautomator2.exceptions import ConnectError
+
+
+@pytest.fixture
+def mock_client():
+    """Create a _BaseClient with a mock adb device, without starting uiautomator"""
+    mock_dev = Mock()
+    with patch.object(_BaseClient, '__init__', return_value=None):
+        client = _BaseClient(None)
+        client._dev = mock_dev
+        client._debug = False
+        client._prefer_supershell = False
+        yield client, mock_dev
+
+
+def test_device_info_cached(mock_client):
+    client, mock_dev = mock_client
+    mock_dev.shell.return_value = "abc123\r\n30\r\n11\r\ngoogle\r\nPixel 5\r\narm64-v8a"
+
+    info = client.device_info
+    assert info == {
+        "serial": "abc123",
+        "sdk": 30,
+        "brand": "google",
+        "model": "Pixel 5",
+        "arch": "arm64-v8a",
+        "version": 11,
+    }
+    assert client.device_info is info
+    mock_dev.shell.assert_called_once()
+
+
+def test_device_info_empty_props(mock_client):
+    client, mock_dev = mock_client
+    # adb shell strips the output, so empty trailing values are missing
+    mock_dev.shell.return_value = "abc123\n30\n11"
+
+    info = client.device_info
+    assert info["serial"] == "abc123"
+    assert info["sdk"] == 30
+    assert info["brand"] == ""
+    assert info["arch"] == ""
+
+
+def test_jsonrpc_wrapper_binds_method():
+    server = Mock()
+    jsonrpc = JSONRpcWrapper(server)
+    # calls looked up before being invoked must not overwrite each other
+    device_info, click = jsonrpc.deviceInfo, jsonrpc.click
+    click(100, 200)
+    device_info(http_timeout=5)
+    assert server.jsonrpc_call.call_args_list[0][0] == ("click", (100, 200), HTTP_TIMEOUT)
+    assert server.jsonrpc_call.call_args_list[1][0] == ("deviceInfo", {}, 5)
+
+
+def test_jsonrpc_batch_queues_calls():
+    server = Mock()
+    server.jsonrpc_call_batch.return_value = [{"sdkInt": 30}, "<hierarchy/>", {"text": "OK"}]
+    with JSONRpcBatch(server, http_timeout=5) as b:
+        assert b.deviceInfo() == 0
+        assert b.dumpWindowHierarchy(False, 50) == 1
+        assert b.call("objInfo", {"text": "OK"}) == 2
+    server.jsonrpc_call_batch.assert_called_once_with(
+        [("deviceInfo", {}), ("dumpWindowHierarchy", (False, 50)), ("objInfo", ({"text": "OK"},))], 5, False)
+    assert b.results == [{"sdkInt": 30}, "<hierarchy/>", {"text": "OK"}]
+
+
+def test_jsonrpc_cached(mock_client):
+    client, _ = mock_client
+    assert client.jsonrpc is client.jsonrpc
+
+
+def test_shell_adb_mode_skips_supershell(mock_client):
+    client, mock_dev = mock_client
+    mock_dev.shell2.return_value = Mock(output="test\n", returncode=0)
+    with patch.object(_BaseClient, 'jsonrpc_call') as mock_rpc:
+        ret = client.shell(["echo", "test"])
+    assert ret.output == "test\n"
+    assert ret.exit_code == 0
+    mock_dev.shell2.assert_called_once_with(["echo", "test"], timeout=60)
+    mock_rpc.assert_not_called()
+
+
+def test_shell_prefer_supershell(mock_client):
+    client, mock_dev = mock_client
+    client._prefer_supershell = True
+    with patch.object(_BaseClient, 'jsonrpc_call', return_value="test\n") as mock_rpc:
+        ret = client.shell(["echo", "test"])
+    assert ret.output == "test\n"
+    assert mock_rpc.call_args[0][:2] == ("superShell", ("echo test",))
+    mock_dev.shell2.assert_not_called()
+
+
+def test_info_short_ttl_cache(mock_client):
+    client, _ = mock_client
+    with patch.object(_BaseClient, 'jsonrpc_call', return_value={"displayWidth": 1080}) as mock_rpc:
+        info = client.info
+        info["displayWidth"] = 0
+        # callers get a copy, modifying it doesn't change the cache
+        assert client.info == {"displayWidth": 1080}
+        mock_rpc.assert_called_once()
+
+        with patch("uiautomator2.base.time.monotonic", return_value=time.monotonic() + INFO_CACHE_TTL):
+            client.info
+        assert mock_rpc.call_count == 2
+
+        client._info_cache = None
+        client.info
+        assert mock_rpc.call_count == 3
+
+
+@pytest.mark.parametrize("serial, remote", [("emulator-5554", False), ("10.0.0.2:5555", True)])
+def test_wait_for_device_single_wait(mock_client, serial, remote):
+    client, _ = mock_client
+    client._BaseClient__serial = serial
+    with patch("uiautomator2.base.adbutils.adb") as mock_adb:
+        mock_adb.device_list.return_value = []
+        mock_adb.connect.return_value = f"connected to {serial}"
+        assert client._wait_for_device(timeout=3) is mock_adb.device.return_value
+    assert mock_adb.connect.call_count == (1 if remote else 0)
+    mock_adb.wait_for.assert_called_once()
+    assert mock_adb.wait_for.call_args[1]["timeout"] <= 3
+
+
+def test_wait_for_device_remote_connect_failed(mock_client):
+    client, _ = mock_client
+    client._BaseClient__serial = "10.0.0.2:5555"
+    with patch("uiautomator2.base.adbutils.adb") as mock_adb:
+        mock_adb.device_list.return_value = []
+        mock_adb.connect.return_value = "failed to connect to '10.0.0.2:5555': Connection refused"
+        with pytest.raises(ConnectError):
+            client._wait_for_device()
+    mock_adb.wait_for.assert_not_called()
+
+
+def test_wait_for_device_already_online(mock_client):
+    client, _ = mock_client
+    client._BaseClient__serial = "emulator-5554"
+    dev = Mock(serial="emulator-5554")
+    with patch("uiautomator2.base.adbutils.adb") as mock_adb:
+        mock_adb.device_list.return_value = [Mock(serial="other"), dev]
+        assert client._wait_for_device() is dev
+    mock_adb.device_list.assert_called_once()
+    mock_adb.wait_for.assert_not_called()
+
+
+def test_shell_adb_mode_skips_quoting(mock_client):
+    client, mock_dev = mock_client
+    mock_dev.shell2.return_value = Mock(output="", returncode=0)
+    with patch("uiautomator2.base.list2cmdline") as mock_list2cmdline:
+        client.shell(["echo", "test"])
+    mock_list2cmdline.assert_not_called()
@@ -1,12 +1,26 @@
 # coding: utf-8
 #
 
+import errno
 import hashlib
-from unittest.mock import Mock, mock_open, patch
+import json
+import re
+import selectors
+import socket
+import struct
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import Mock, patch
 
 import pytest
 
-from uiautomator2.core import BasicUiautomatorServer
+from uiautomator2.abstract import ShellResponse
+from uiautomator2.core import AdbHTTPConnection, BasicUiautomatorServer, HTTPResponse, MockAdbProcess, \
+    WiFiHTTPConnection, _AdbForward, _ConnectionPool, _file_md5, _http_request, _json_dumps, _jsonrpc_call_batch, \
+    _adb_server_is_local, _parse_jsonrpc_response, _ProcessOutputReader, _ResolvedAddress
+from uiautomator2.exceptions import AccessibilityServiceAlreadyRegisteredError, HTTPError, HTTPTimeoutError, \
+    LaunchUiAutomationError, RPCInvalidError, RPCStackOverflowError, RPCUnknownError, UiAutomationNotConnectedError, \
+    UiObjectNotFoundError
 
 
 @pytest.fixture
@@ -22,11 +36,11 @@ def mock_server():
 class TestCheckDeviceFileHash:
     """Test the _check_device_file_hash method with toybox fallback"""
     
-    def test_toybox_md5sum_success(self, mock_server):
+    def test_toybox_md5sum_success(self, mock_server, tmp_path):
         """Test when toybox md5sum command works correctly"""
         server, mock_dev = mock_server
         
-        # Create a temporary file with known content
+        # Create a local file with known content
         test_content = b"test content for md5"
         local_md5 = hashlib.md5(test_content).hexdigest()
         
@@ -34,20 +48,59 @@ class TestCheckDeviceFileHash:
         # Format: "md5hash  filename"
         mock_dev.shell.return_value = f"{local_md5}  /data/local/tmp/u2.jar"
         
-        # Mock the file read to return our test content
-        with patch("builtins.open", mock_open(read_data=test_content)):
-            result = server._check_device_file_hash("test.jar", "/data/local/tmp/u2.jar")
+        local_file = tmp_path / "test.jar"
+        local_file.write_bytes(test_content)
+        result = server._check_device_file_hash(local_file, "/data/local/tmp/u2.jar")
         
         # Verify the result is True (hash matches)
         assert result is True
-        # Verify toybox md5sum was called
-        mock_dev.shell.assert_called_once_with(["toybox", "md5sum", "/data/local/tmp/u2.jar"])
+        # Verify the size test and toybox md5sum run in a single shell call
+        mock_dev.shell.assert_called_once_with(
+            f'[ "$(stat -c %s /data/local/tmp/u2.jar)" = "{len(test_content)}" ] && toybox md5sum /data/local/tmp/u2.jar')
+
+    @pytest.mark.parametrize("output", [
+        "",  # size mismatch, md5sum is not run
+        "stat: '/data/local/tmp/u2.jar': No such file or directory",
+    ])
+    def test_size_mismatch_or_missing(self, mock_server, tmp_path, output):
+        """Test a remote file of another size, or no file, is reported with no second shell call"""
+        server, mock_dev = mock_server
+        mock_dev.shell.return_value = output
+        
+        local_file = tmp_path / "test.jar"
+        local_file.write_bytes(b"test content for md5")
+        assert server._check_device_file_hash(local_file, "/data/local/tmp/u2.jar") is False
+        mock_dev.shell.assert_called_once()
+
+    def test_local_md5_cached(self, mock_server, tmp_path):
+        """Test the local file is hashed once until it changes"""
+        server, mock_dev = mock_server
+        local_file = tmp_path / "test.jar"
+        local_file.write_bytes(b"test content for md5")
+        remote_md5 = hashlib.md5(b'test content for md5').hexdigest()
+        mock_dev.shell.return_value = f"{remote_md5}  /data/local/tmp/u2.jar"
+
+        with patch("builtins.open", wraps=open) as mock_file:
+            assert server._check_device_file_hash(local_file, "/data/local/tmp/u2.jar") is True
+            assert server._check_device_file_hash(local_file, "/data/local/tmp/u2.jar") is True
+        assert mock_file.call_count == 1
+
+        local_file.write_bytes(b"new content")
+        assert server._check_device_file_hash(local_file, "/data/local/tmp/u2.jar") is False
+
+    def test_local_md5_chunked_fallback(self, tmp_path):
+        """Test the chunked md5 used before Python 3.11 gives the same digest"""
+        local_file = tmp_path / "test.jar"
+        content = b"0123456789" * 300000
+        local_file.write_bytes(content)
+        with patch("uiautomator2.core.hashlib", Mock(spec=["md5"], md5=hashlib.md5)):
+            assert _file_md5(local_file) == hashlib.md5(content).hexdigest()
     
-    def test_toybox_not_found_fallback_to_md5(self, mock_server):
+    def test_toybox_not_found_fallback_to_md5(self, mock_server, tmp_path):
         """Test fallback to md5 command when toybox is not found"""
         server, mock_dev = mock_server
         
-        # Create a temporary file with known content
+        # Create a local file with known content
         test_content = b"test content for md5"
         local_md5 = hashlib.md5(test_content).hexdigest()
         
@@ -55,55 +108,533 @@ class TestCheckDeviceFileHash:
         # First call: toybox not found
         # Second call: md5 command output (format: "MD5 (filename) = md5hash")
         mock_dev.shell.side_effect = [
-            "toybox: not found",
+            "/system/bin/sh: toybox: not found",
             f"MD5 (/data/local/tmp/u2.jar) = {local_md5}"
         ]
         
-        # Mock the file read to return our test content
-        with patch("builtins.open", mock_open(read_data=test_content)):
-            result = server._check_device_file_hash("test.jar", "/data/local/tmp/u2.jar")
+        local_file = tmp_path / "test.jar"
+        local_file.write_bytes(test_content)
+        result = server._check_device_file_hash(local_file, "/data/local/tmp/u2.jar")
         
         # Verify the result is True (hash matches)
         assert result is True
-        # Verify both commands were called
+        # Verify md5 was called after toybox md5sum
         assert mock_dev.shell.call_count == 2
-        assert mock_dev.shell.call_args_list[0][0][0] == ["toybox", "md5sum", "/data/local/tmp/u2.jar"]
+        assert "toybox md5sum" in mock_dev.shell.call_args_list[0][0][0]
         assert mock_dev.shell.call_args_list[1][0][0] == ["md5", "/data/local/tmp/u2.jar"]
     
-    def test_hash_mismatch(self, mock_server):
+    def test_hash_mismatch(self, mock_server, tmp_path):
         """Test when the hash doesn't match"""
         server, mock_dev = mock_server
         
-        # Create a temporary file with known content
+        # Create a local file with known content
         test_content = b"test content for md5"
         different_md5 = hashlib.md5(b"different content").hexdigest()
         
         # Mock the shell command to return a different hash
         mock_dev.shell.return_value = f"{different_md5}  /data/local/tmp/u2.jar"
         
-        # Mock the file read to return our test content
-        with patch("builtins.open", mock_open(read_data=test_content)):
-            result = server._check_device_file_hash("test.jar", "/data/local/tmp/u2.jar")
+        local_file = tmp_path / "test.jar"
+        local_file.write_bytes(test_content)
+        result = server._check_device_file_hash(local_file, "/data/local/tmp/u2.jar")
         
         # Verify the result is False (hash doesn't match)
         assert result is False
     
-    def test_md5_command_also_fails(self, mock_server):
+    def test_md5_command_also_fails(self, mock_server, tmp_path):
         """Test when both toybox and md5 commands fail to find the file"""
         server, mock_dev = mock_server
         
-        # Create a temporary file with known content
+        # Create a local file with known content
         test_content = b"test content for md5"
         
         # Mock the shell command to return errors for both commands
         mock_dev.shell.side_effect = [
-            "toybox: not found",
+            "/system/bin/sh: toybox: not found",
             "md5: /data/local/tmp/u2.jar: No such file or directory"
         ]
         
-        # Mock the file read to return our test content
-        with patch("builtins.open", mock_open(read_data=test_content)):
-            result = server._check_device_file_hash("test.jar", "/data/local/tmp/u2.jar")
+        local_file = tmp_path / "test.jar"
+        local_file.write_bytes(test_content)
+        result = server._check_device_file_hash(local_file, "/data/local/tmp/u2.jar")
         
         # Verify the result is False (file not found on device)
         assert result is False
+
+
+class TestMockAdbProcess:
+    def test_output_and_exit(self):
+        local, remote = socket.socketpair()
+        process = MockAdbProcess(Mock(conn=local))
+        remote.sendall(b"Starting Server")
+        remote.close()
+        assert process.wait()
+        assert process.pool() == 0
+        assert process.output == b"Starting Server"
+
+    def test_reader_survives_select_error(self):
+        fail = threading.Event()
+
+        class FailOnceSelector(selectors.SelectSelector):
+            def select(self, timeout=None):
+                if fail.is_set():
+                    fail.clear()
+                    raise OSError(errno.EBADF, "Bad file descriptor")
+                return super().select(timeout)
+
+        output = threading.Event()
+        process = Mock()
+        process._on_output.side_effect = lambda chunk: output.set()
+        with patch("uiautomator2.core.selectors.DefaultSelector", FailOnceSelector):
+            local, remote = socket.socketpair()
+            _ProcessOutputReader().add(local, process)
+            fail.set()
+            # wakes the select in progress, the next one fails
+            remote.sendall(b"Starting Server")
+            assert output.wait(3)
+            output.clear()
+            remote.sendall(b"more")
+            assert output.wait(3)
+        local.close()
+        remote.close()
+
+    def test_drop_closed(self):
+        (closed, peer1), (alive, peer2) = socket.socketpair(), socket.socketpair()
+        wakeup, peer3 = socket.socketpair()
+        selector = selectors.SelectSelector()
+        closed_process, alive_process = Mock(), Mock()
+        selector.register(wakeup, selectors.EVENT_READ)
+        selector.register(closed, selectors.EVENT_READ, closed_process)
+        selector.register(alive, selectors.EVENT_READ, alive_process)
+        closed.close()
+        _ProcessOutputReader._drop_closed(selector, wakeup)
+        closed_process._on_finished.assert_called_once()
+        alive_process._on_finished.assert_not_called()
+        assert len(selector.get_map()) == 2
+        for sock in (peer1, alive, peer2, wakeup, peer3):
+            sock.close()
+
+    def test_kill(self):
+        pairs = [socket.socketpair() for _ in range(4)]
+        conn = Mock(conn=pairs[0][0])
+        processes = [MockAdbProcess(conn)] + [MockAdbProcess(Mock(conn=local)) for local, _ in pairs[1:]]
+        assert processes[0].pool() is None
+        processes[0].kill()
+        assert processes[0].pool() == 0
+        conn.close.assert_called_once()
+        # the other processes are still drained by the same reader
+        assert all(p.pool() is None for p in processes[1:])
+        for _, remote in pairs:
+            remote.close()
+
+
+class TestStartUiautomator:
+    def test_running_process_skips_ping(self, mock_server):
+        server, _ = mock_server
+        server._process = Mock()
+        server._process.pool.return_value = None
+        with patch.object(BasicUiautomatorServer, '_setup_jar'), \
+                patch.object(BasicUiautomatorServer, '_check_alive') as mock_check_alive, \
+                patch("uiautomator2.core.launch_uiautomator") as mock_launch:
+            server.start_uiautomator()
+        mock_check_alive.assert_not_called()
+        mock_launch.assert_not_called()
+
+    def test_failed_launch_not_kept(self, mock_server):
+        server, _ = mock_server
+        server._process = None
+        failed, ready = Mock(), Mock()
+        failed.pool.return_value = None
+        ready.pool.return_value = None
+        with patch.object(BasicUiautomatorServer, '_setup_jar'), \
+                patch.object(BasicUiautomatorServer, '_check_alive', return_value=False), \
+                patch.object(BasicUiautomatorServer, '_wait_ready',
+                             side_effect=[LaunchUiAutomationError("server not ready"), None]), \
+                patch("uiautomator2.core.launch_uiautomator", side_effect=[failed, ready]) as mock_launch:
+            with pytest.raises(LaunchUiAutomationError):
+                server.start_uiautomator()
+            failed.kill.assert_called_once()
+            assert server._process is None
+            # the retry launches again instead of trusting the still running failed process
+            server.start_uiautomator()
+        assert mock_launch.call_count == 2
+        assert server._process is ready
+
+    def test_wait_ready_backoff(self, mock_server):
+        server, _ = mock_server
+        server._process = Mock(output=b"")
+        server._process.pool.return_value = None
+        with patch.object(BasicUiautomatorServer, '_check_alive', side_effect=[False, False, False, True]), \
+                patch("uiautomator2.core.time.sleep") as mock_sleep:
+            server._wait_app_process_ready(30)
+        delays = [c[0][0] for c in mock_sleep.call_args_list]
+        assert delays == pytest.approx([0.1, 0.15, 0.225])
+
+    def test_wait_ready_already_registered(self, mock_server):
+        server, _ = mock_server
+        server._process = Mock(output=bytearray(b"[server] INFO: Starting Server\nUiAutomationService already registered!"))
+        server._process.pool.return_value = None
+        with pytest.raises(AccessibilityServiceAlreadyRegisteredError, match="already registered"):
+            server._wait_app_process_ready(30)
+
+
+def test_json_codec_roundtrip():
+    """Request bodies are bytes and responses decode from bytes, with orjson or the stdlib json"""
+    payload = {"jsonrpc": "2.0", "id": 1, "method": "objInfo", "params": [{"text": "设置", "index": 0}]}
+    body = _json_dumps(payload)
+    assert isinstance(body, bytes)
+    assert HTTPResponse(bytearray(body)).json() == payload
+
+
+@pytest.mark.parametrize("params", [
+    ShellResponse("ok", 0),
+    {1: "a", None: "b"},
+    [2 ** 70, -2 ** 70],
+    [float("nan"), float("inf"), -float("inf"), None],
+    [{"text": "设置", "index": 0}, (1.5, None)],
+])
+def test_json_dumps_matches_stdlib(params):
+    pytest.importorskip("orjson")
+    payload = {"jsonrpc": "2.0", "id": 1, "method": "test", "params": params}
+    # compared after a stdlib round trip, orjson writes compact separators and raw utf-8
+    assert json.dumps(json.loads(_json_dumps(payload))) == json.dumps(json.loads(json.dumps(payload)))
+
+
+class TestJsonrpcCallBatch:
+    """Test _jsonrpc_call_batch sends one request and demultiplexes the responses by id"""
+
+    def _mock_response(self, data):
+        return HTTPResponse(json.dumps(data).encode())
+
+    def test_results_in_call_order(self):
+        calls = [("deviceInfo", []), ("dumpWindowHierarchy", [False, 50])]
+        # batch responses may come back in any order
+        response = self._mock_response([
+            {"jsonrpc": "2.0", "id": 2, "result": "<hierarchy/>"},
+            {"jsonrpc": "2.0", "id": 1, "result": {"sdkInt": 30}},
+        ])
+        with patch("uiautomator2.core._http_request", return_value=response) as mock_request:
+            results = _jsonrpc_call_batch(Mock(), calls, 10, False)
+
+        assert results == [{"sdkInt": 30}, "<hierarchy/>"]
+        mock_request.assert_called_once()
+        payload = mock_request.call_args[0][3]
+        assert [item["id"] for item in payload] == [1, 2]
+        assert [item["method"] for item in payload] == ["deviceInfo", "dumpWindowHierarchy"]
+
+    def test_error_raised(self):
+        calls = [("deviceInfo", []), ("objInfo", [{}])]
+        response = self._mock_response([
+            {"jsonrpc": "2.0", "id": 1, "result": {"sdkInt": 30}},
+            {"jsonrpc": "2.0", "id": 2, "error": {"code": -32001, "message": "uiautomator.UiObjectNotFoundException"}},
+        ])
+        with patch("uiautomator2.core._http_request", return_value=response):
+            with pytest.raises(UiObjectNotFoundError):
+                _jsonrpc_call_batch(Mock(), calls, 10, False)
+
+    def test_return_exceptions(self):
+        calls = [("deviceInfo", []), ("objInfo", [{}])]
+        response = self._mock_response([
+            {"jsonrpc": "2.0", "id": 1, "result": {"sdkInt": 30}},
+        ])
+        with patch("uiautomator2.core._http_request", return_value=response):
+            results = _jsonrpc_call_batch(Mock(), calls, 10, False, return_exceptions=True)
+
+        assert results[0] == {"sdkInt": 30}
+        assert isinstance(results[1], RPCInvalidError)
+
+    def test_empty_batch(self):
+        with patch("uiautomator2.core._http_request") as mock_request:
+            assert _jsonrpc_call_batch(Mock(), [], 10, False) == []
+        mock_request.assert_not_called()
+
+
+@pytest.mark.parametrize("message, error_class", [
+    ("java.lang.IllegalStateException: UiAutomation not connected", UiAutomationNotConnectedError),
+    ("android.os.DeadObjectException", UiAutomationNotConnectedError),
+    ("android.os.DeadSystemRuntimeException", UiAutomationNotConnectedError),
+    ("androidx.test.uiautomator.UiObjectNotFoundException: UiSelector[TEXT=ok]", UiObjectNotFoundError),
+    ("java.lang.StackOverflowError", RPCStackOverflowError),
+    ("java.lang.NullPointerException", RPCUnknownError),
+])
+@pytest.mark.parametrize("with_content", [True, False])
+def test_parse_jsonrpc_response_error(message, error_class, with_content):
+    data = {"jsonrpc": "2.0", "id": 1, "error": {"code": -32001, "message": message, "data": "at " * 1000}}
+    content = json.dumps(data).encode() if with_content else None
+    with pytest.raises(error_class):
+        _parse_jsonrpc_response(data, None, content)
+
+
+def test_parse_jsonrpc_response_not_connected_in_stacktrace():
+    data = {"jsonrpc": "2.0", "id": 1, "error": {
+        "code": -32001, "message": "java.lang.IllegalStateException",
+        "data": "java.lang.IllegalStateException: UiAutomation not connected, UiAutomation@1"}}
+    with pytest.raises(UiAutomationNotConnectedError):
+        _parse_jsonrpc_response(data, None, json.dumps(data).encode())
+    # batch item, no raw content
+    with pytest.raises(UiAutomationNotConnectedError):
+        _parse_jsonrpc_response(data, None)
+
+
+LARGE_BODY = bytes(range(256)) * 4096  # 1 MiB, above READINTO_THRESHOLD
+
+
+class _PingHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.connections.add(self.client_address)
+        body = LARGE_BODY if self.path == "/large" else b"pong"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def http_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _PingHandler)
+    server.daemon_threads = True
+    server.connections = set()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class TestConnectionPool:
+    def test_reuse_connection(self, http_server):
+        host, port = http_server.server_address
+        pool = _ConnectionPool(lambda: WiFiHTTPConnection(host, port), f"http://{host}:{port}")
+        for _ in range(3):
+            r = _http_request(pool, "GET", "/ping")
+            assert r.content == b"pong"
+        assert len(http_server.connections) == 1
+        pool.close()
+
+    def test_reconnect_after_server_closed(self, http_server):
+        host, port = http_server.server_address
+        pool = _ConnectionPool(lambda: WiFiHTTPConnection(host, port), f"http://{host}:{port}")
+        _http_request(pool, "GET", "/ping")
+        # simulate the server dropping the idle keep-alive connection
+        pool._idle[-1].sock.shutdown(socket.SHUT_RDWR)
+        r = _http_request(pool, "GET", "/ping")
+        assert r.content == b"pong"
+        assert len(http_server.connections) == 2
+        pool.close()
+
+    def _scripted_server(self, *handlers):
+        """Serve the n-th accepted connection with handlers[n](conn, read_request), return (port, requests seen)"""
+        listener = socket.socket()
+        listener.bind(("127.0.0.1", 0))
+        listener.listen()
+        seen = []
+
+        def serve():
+            for handler in handlers:
+                conn, _ = listener.accept()
+
+                def read_request():
+                    # each request arrives whole before the client waits for the reply
+                    data = conn.recv(65536)
+                    head, _, body = data.partition(b"\r\n\r\n")
+                    length = re.search(rb"Content-Length: (\d+)", head)
+                    while length and len(body) < int(length.group(1)):
+                        body += conn.recv(65536)
+                    seen.append(head)
+                handler(conn, read_request)
+            listener.close()
+        threading.Thread(target=serve, daemon=True).start()
+        return listener.getsockname()[1], seen
+
+    PONG = b"HTTP/1.1 200 OK\r\nContent-Length: 4\r\n\r\npong"
+
+    def _reply_pong(self, conn, read_request):
+        read_request()
+        conn.sendall(self.PONG)
+
+    def test_retry_when_idle_connection_closed_before_reply(self):
+        def close_after_first(conn, read_request):
+            read_request()
+            conn.sendall(self.PONG)
+            read_request()
+            conn.close()
+
+        port, seen = self._scripted_server(close_after_first, self._reply_pong)
+        pool = _ConnectionPool(lambda: WiFiHTTPConnection("127.0.0.1", port), f"http://127.0.0.1:{port}")
+        assert _http_request(pool, "GET", "/ping").content == b"pong"
+        # RemoteDisconnected on the reused connection, sent again on a new one
+        assert _http_request(pool, "GET", "/ping").content == b"pong"
+        assert len(seen) == 3
+        pool.close()
+
+    def test_no_retry_when_reset_during_response(self):
+        def reset_during_second(conn, read_request):
+            read_request()
+            conn.sendall(self.PONG)
+            read_request()
+            conn.sendall(b"HTTP/1.1 200 OK\r\n")
+            # close with RST instead of FIN
+            conn.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0))
+            conn.close()
+
+        port, seen = self._scripted_server(reset_during_second, self._reply_pong)
+        pool = _ConnectionPool(lambda: WiFiHTTPConnection("127.0.0.1", port), f"http://127.0.0.1:{port}")
+        assert _http_request(pool, "GET", "/ping").content == b"pong"
+        with pytest.raises(HTTPError):
+            _http_request(pool, "POST", "/jsonrpc/0", {"method": "click"})
+        # the server got the request, it must not be sent twice
+        assert len(seen) == 2
+        pool.close()
+
+    def test_large_body(self, http_server):
+        host, port = http_server.server_address
+        pool = _ConnectionPool(lambda: WiFiHTTPConnection(host, port), f"http://{host}:{port}")
+        r = _http_request(pool, "GET", "/large")
+        assert r.content == LARGE_BODY
+        # the body was fully drained, the connection is reused
+        assert _http_request(pool, "GET", "/ping").content == b"pong"
+        assert len(http_server.connections) == 1
+        pool.close()
+
+    def test_read_timeout(self):
+        # accepts the connection but never replies
+        listener = socket.socket()
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(1)
+        host, port = listener.getsockname()
+        pool = _ConnectionPool(lambda: WiFiHTTPConnection(host, port), f"http://{host}:{port}")
+        try:
+            with pytest.raises(HTTPTimeoutError):
+                _http_request(pool, "GET", "/ping", timeout=0.3)
+            # the timed out connection is not kept for reuse
+            assert not pool._idle
+        finally:
+            pool.close()
+            listener.close()
+
+    def test_idle_connections_bounded(self):
+        factory = Mock(side_effect=lambda: Mock())
+        pool = _ConnectionPool(factory, "http://127.0.0.1:9008", max_idle=2)
+        conns = [pool._acquire()[0] for _ in range(3)]
+        assert factory.call_count == 3
+        for conn in conns:
+            pool._release(conn)
+        conns[2].close.assert_called_once()
+        # last released, first reused
+        assert pool._acquire() == (conns[1], True)
+        pool.close()
+        conns[0].close.assert_called_once()
+
+    def test_socket_options(self, http_server):
+        host, port = http_server.server_address
+        pool = _ConnectionPool(lambda: WiFiHTTPConnection(host, port), f"http://{host}:{port}")
+        _http_request(pool, "GET", "/ping")
+        sock = pool._idle[-1].sock
+        assert sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY)
+        assert sock.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE)
+        pool.close()
+
+
+class TestResolvedAddress:
+    def test_resolved_once(self, http_server):
+        host, port = http_server.server_address
+        address = _ResolvedAddress(host, port)
+        with patch("uiautomator2.core.socket.getaddrinfo", wraps=socket.getaddrinfo) as mock_getaddrinfo:
+            for _ in range(2):
+                with WiFiHTTPConnection(host, port, address) as conn:
+                    conn.request("GET", "/ping")
+                    assert conn.getresponse().read() == b"pong"
+        assert mock_getaddrinfo.call_count == 1
+
+    def test_invalidated_on_connect_failure(self):
+        address = _ResolvedAddress("127.0.0.1", 9)
+        address._addr = (socket.AF_INET, ("127.0.0.1", 1))
+        with pytest.raises(HTTPError):
+            WiFiHTTPConnection("127.0.0.1", 9, address).connect()
+        assert address._addr is None
+
+
+def test_print_request(http_server, capsys):
+    host, port = http_server.server_address
+    pool = _ConnectionPool(lambda: WiFiHTTPConnection(host, port), f"http://{host}:{port}")
+    _http_request(pool, "GET", "/ping", print_request=True)
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0] == "# http timeout=10.0"
+    assert lines[1].endswith(f" $ curl -X GET http://{host}:{port}/ping")
+    assert lines[2].endswith(" Response >>>")
+    assert lines[3] == "pong"
+    assert lines[4].startswith("<<< END timed_used = ")
+
+
+class TestAdbForward:
+    def test_connect_through_forward(self, http_server):
+        host, port = http_server.server_address
+        device = Mock()
+        device.forward_port.return_value = port
+        forward = _AdbForward(device, 9008)
+        pool = _ConnectionPool(lambda: AdbHTTPConnection(device, 9008, forward), "http://127.0.0.1:9008")
+        for _ in range(2):
+            r = _http_request(pool, "GET", "/ping")
+            assert r.content == b"pong"
+        device.forward_port.assert_called_once_with(9008)
+        device.create_connection.assert_not_called()
+        pool.close()
+
+    def test_forward_invalidated_on_connect_failure(self):
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            closed_port = s.getsockname()[1]
+        device = Mock()
+        device.forward_port.return_value = closed_port
+        forward = _AdbForward(device, 9008)
+        with pytest.raises(HTTPError):
+            pool = _ConnectionPool(lambda: AdbHTTPConnection(device, 9008, forward), "http://127.0.0.1:9008")
+            _http_request(pool, "GET", "/ping")
+        assert forward._local_port is None
+        # the stale forward is removed before the next connect forwards again
+        device.forward_remove.assert_called_once_with(f"tcp:{closed_port}", raise_non_found=False)
+
+    def test_stop_removes_forward(self, mock_server):
+        server, mock_dev = mock_server
+        mock_dev.forward_port.return_value = 12345
+        server._process = None
+        server._pool = Mock()
+        server._forward = _AdbForward(mock_dev, 9008)
+        server._forward.get()
+        server.stop_uiautomator(wait=False)
+        server._pool.close.assert_called_once()
+        mock_dev.forward_remove.assert_called_once_with("tcp:12345", raise_non_found=False)
+        # nothing forwarded since, nothing to remove
+        server.stop_uiautomator(wait=False)
+        mock_dev.forward_remove.assert_called_once()
+
+    @pytest.mark.parametrize("host, expected", [
+        ("127.0.0.1", True), ("localhost", True), ("::1", True), ("192.168.1.10", False), ("adb-host", False),
+    ])
+    def test_adb_server_is_local(self, host, expected):
+        device = Mock()
+        device._client.host = host
+        assert _adb_server_is_local(device) is expected
+
+    def test_server_not_listening(self):
+        # adb forward accepts the connection and closes it when nothing listens on the device port
+        listener = socket.socket()
+        listener.bind(("127.0.0.1", 0))
+        listener.listen()
+
+        def accept_and_close():
+            conn, _ = listener.accept()
+            conn.recv(1024)
+            conn.close()
+        threading.Thread(target=accept_and_close, daemon=True).start()
+
+        device = Mock()
+        device.forward_port.return_value = listener.getsockname()[1]
+        pool = _ConnectionPool(lambda: AdbHTTPConnection(device, 9008, _AdbForward(device, 9008)), "http://127.0.0.1:9008")
+        with pytest.raises(HTTPError):
+            _http_request(pool, "GET", "/ping")
+        listener.close()
@@ -151,6 +151,7 @@ class _WiFiDevice(_WiFiBaseClient):
         for values in self.__orientation:
             if value in values:
                 self.jsonrpc.setOrientation(values[1])
+                self._info_cache = None
                 break
         else:
             raise ValueError("Invalid orientation.")
@@ -162,10 +163,12 @@ class _WiFiDevice(_WiFiBaseClient):
     def screen_on(self):
         """Turn on screen (WiFi mode)"""
         self.jsonrpc.wakeUp()
+        self._info_cache = None
     
     def screen_off(self):
         """Turn off screen (WiFi mode)"""
         self.jsonrpc.sleep()
+        self._info_cache = None
     
     def press(self, key: Union[int, str], meta=None):
         """Press key (WiFi mode)"""
@@ -645,9 +648,11 @@ class _Device(_BaseClient):
 
     def screen_on(self):
         self.jsonrpc.wakeUp()
+        self._info_cache = None
 
     def screen_off(self):
         self.jsonrpc.sleep()
+        self._info_cache = None
 
     @property
     def orientation(self) -> str:
@@ -667,6 +672,7 @@ class _Device(_BaseClient):
             if value in values:
                 # can not set upside-down until api level 18.
                 self.jsonrpc.setOrientation(values[1])
+                self._info_cache = None
                 break
         else:
             raise ValueError("Invalid orientation.")
@@ -828,7 +834,8 @@ class _AppMixIn(AbstractShell):
         # WiFi mode: use JSON-RPC deviceInfo to get current package
         if not hasattr(self, '_dev') or self._dev is None:
             # WiFi mode: get current package from deviceInfo
-            info = self.info
+            # bypass the info cache, the foreground app may have just changed
+            info = self.jsonrpc.deviceInfo(http_timeout=10)
             current_package = info.get('currentPackageName', '')
             if current_package:
                 # Try to get activity via dumpsys
@@ -1222,7 +1229,8 @@ class _DeprecatedMixIn: # pragma: no cover
 
     def unlock(self):
         """ unlock screen with swipe from left-bottom to right-top """
-        if not self.info['screenOn']:
+        # bypass the info cache, screenOn must be current
+        if not self.jsonrpc.deviceInfo(http_timeout=10)['screenOn']:
             # WAKEUP might be stuck
             self.shell("input keyevent POWER")
             self.swipe(0.1, 0.9, 0.9, 0.1)
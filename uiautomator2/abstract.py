@@ -33,6 +33,10 @@ class AbstractUiautomatorServer(abc.ABC):
     def jsonrpc_call(self, method: str, params: Any = None) -> Any:
         pass
 
+    @abc.abstractmethod
+    def jsonrpc_call_batch(self, calls: List[Tuple[str, Any]], timeout: float = 10, return_exceptions: bool = False) -> List[Any]:
+        """ send calls [(method, params), ...] in one JSON-RPC batch request, return results in call order """
+
 
 
 class AbstractShell(abc.ABC):
@@ -10,28 +10,107 @@ import adbutils
 
 from uiautomator2._proto import HTTP_TIMEOUT, SCROLL_STEPS, Direction
 from uiautomator2.abstract import ShellResponse
-from uiautomator2.core import BasicUiautomatorServer, WiFiUiautomatorServer, WiFiUiautomatorServer
+from uiautomator2.core import BasicUiautomatorServer, WiFiUiautomatorServer
 from uiautomator2.exceptions import *
 from uiautomator2.settings import Settings
 from uiautomator2.utils import deprecated, image_convert, list2cmdline
 
 logger = logging.getLogger(__name__)
 
+_RE_REMOTE_ADB = re.compile(r"^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}:\d+$")
+
+# seconds a deviceInfo result is reused, so bursts like window_size() right after info share one request
+INFO_CACHE_TTL = 0.5
+
+
+class JSONRpcBatch:
+    """
+    Collect jsonrpc calls and send them to the server in a single http request
+
+    Usage:
+        with d.jsonrpc.batch() as b:
+            b.deviceInfo()
+            b.dumpWindowHierarchy(False, 50)
+            b.call("objInfo", {"text": "OK"})
+        info, xml, obj = b.results
+    """
+    def __init__(self, server: Union[BasicUiautomatorServer, WiFiUiautomatorServer], http_timeout: float = HTTP_TIMEOUT,
+                 return_exceptions: bool = False):
+        self._server = server
+        self._http_timeout = http_timeout
+        self._return_exceptions = return_exceptions
+        self._calls: List[Tuple[str, Any]] = []
+        self.results: Optional[List[Any]] = None
+
+    def __getattr__(self, method: str):
+        if method.startswith("_"):
+            raise AttributeError(method)
+
+        def queue(*args, **kwargs) -> int:
+            """ queue the call, return its index in results """
+            return self.call(method, *args, **kwargs)
+        return queue
+
+    def call(self, method: str, *args, **kwargs) -> int:
+        """ queue a call by method name, e.g. b.call("deviceInfo"), return its index in results """
+        self._calls.append((method, args if args else kwargs))
+        return len(self._calls) - 1
+
+    def execute(self) -> List[Any]:
+        """ send all queued calls, return results in call order """
+        calls, self._calls = self._calls, []
+        self.results = self._server.jsonrpc_call_batch(calls, self._http_timeout, self._return_exceptions)
+        return self.results
+
+    def __enter__(self) -> "JSONRpcBatch":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.execute()
+
+
+class JSONRpcWrapper:
+    """
+    Turn attribute access into jsonrpc calls, e.g. d.jsonrpc.deviceInfo()
+
+    Each attribute returns its own bound call, so the wrapper can be shared between threads
+    """
+    __slots__ = ('server',)
+
+    def __init__(self, server: Union[BasicUiautomatorServer, WiFiUiautomatorServer]):
+        self.server = server
+
+    def __getattr__(self, method: str):
+        if method.startswith("__"):
+            raise AttributeError(method)
+        server = self.server
+
+        def call(*args, **kwargs):
+            http_timeout = kwargs.pop('http_timeout', HTTP_TIMEOUT)
+            params = args if args else kwargs
+            return server.jsonrpc_call(method, params, http_timeout)
+        return call
+
+    def batch(self, http_timeout: float = HTTP_TIMEOUT, return_exceptions: bool = False) -> JSONRpcBatch:
+        return JSONRpcBatch(self.server, http_timeout, return_exceptions)
+
 
 class _WiFiBaseClient(WiFiUiautomatorServer):
     """
     WiFi mode base client (no ADB required)
     """
+    _info_cache: Optional[Tuple[float, Dict[str, Any]]] = None
+
     def __init__(self, host: str, port: int = 9008):
-        self.__host = host
-        self.__port = port
+        self._cached_serial = f"{host}:{port}"
         self._dev = None  # No ADB device in WiFi mode
         self._debug = False
         WiFiUiautomatorServer.__init__(self, host, port)
     
     @property
     def _serial(self) -> str:
-        return f"{self.__host}:{self.__port}"
+        return self._cached_serial
     
     @property
     def adb_device(self) -> Optional[adbutils.AdbDevice]:
@@ -61,16 +140,12 @@ class _WiFiBaseClient(WiFiUiautomatorServer):
             AdbShellError
         """
         try:
+            cmd_str = list2cmdline(cmdargs)
             if self.debug:
-                print("shell:", list2cmdline(cmdargs))
-            logger.debug("shell: %s", list2cmdline(cmdargs))
-            
-            # Convert cmdargs to string if it's a list
-            if isinstance(cmdargs, list):
-                cmd_str = list2cmdline(cmdargs)
-            else:
-                cmd_str = cmdargs
-            
+                print("shell:", cmd_str)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("shell: %s", cmd_str)
+
             # Use superShell JSON-RPC method
             result = self.jsonrpc.superShell(cmd_str)
             # superShell returns string output, assume success (exit code 0)
@@ -79,15 +154,16 @@ class _WiFiBaseClient(WiFiUiautomatorServer):
             logger.error(f"superShell failed: {e}")
             raise AdbShellError(f"superShell failed: {e}")
     
-    @property
+    @cached_property
     def device_info(self) -> Dict[str, Any]:
-        """Get device info via JSON-RPC"""
+        """Get device info via JSON-RPC, fetched once since it does not change during a session"""
         info = self.jsonrpc.deviceInfo()
+        product_name = info.get('productName') or ''
         return {
-            "serial": f"{self.__host}:{self.__port}",
+            "serial": self._cached_serial,
             "sdk": info.get('sdkInt'),
-            "brand": info.get('productName', '').split('_')[0] if '_' in info.get('productName', '') else '',
-            "model": info.get('productName', ''),
+            "brand": product_name.partition('_')[0] if '_' in product_name else '',
+            "model": product_name,
             "arch": None,  # Not available via JSON-RPC
             "version": info.get('sdkInt'),
         }
@@ -95,29 +171,21 @@ class _WiFiBaseClient(WiFiUiautomatorServer):
     @property
     def wlan_ip(self) -> Optional[str]:
         """WiFi mode: return the host IP"""
-        return self.__host
+        return self._host
 
     @property
     def info(self) -> Dict[str, Any]:
-        """Get device info via JSON-RPC"""
-        return self.jsonrpc.deviceInfo(http_timeout=10)
-
-    @property
-    def jsonrpc(self):
-        class JSONRpcWrapper():
-            def __init__(self, server: WiFiUiautomatorServer):
-                self.server = server
-                self.method = None
-
-            def __getattr__(self, method):
-                self.method = method  # jsonrpc function name
-                return self
-
-            def __call__(self, *args, **kwargs):
-                http_timeout = kwargs.pop('http_timeout', HTTP_TIMEOUT)
-                params = args if args else kwargs
-                return self.server.jsonrpc_call(self.method, params, http_timeout)
+        """Get device info via JSON-RPC, reused for INFO_CACHE_TTL seconds"""
+        now = time.monotonic()
+        cache = self._info_cache
+        if cache is not None and now - cache[0] < INFO_CACHE_TTL:
+            return dict(cache[1])  # a copy, so callers can't modify the cached dict
+        info = self.jsonrpc.deviceInfo(http_timeout=10)
+        self._info_cache = (now, info)
+        return dict(info)
 
+    @cached_property
+    def jsonrpc(self) -> JSONRpcWrapper:
         return JSONRpcWrapper(self)
 
 
@@ -125,12 +193,15 @@ class _BaseClient(BasicUiautomatorServer):
     """
     提供最基础的控制类，这个类暂时先不公开吧
     """
+    _info_cache: Optional[Tuple[float, Dict[str, Any]]] = None
 
-    def __init__(self, serial: Optional[Union[str, adbutils.AdbDevice]] = None):
+    def __init__(self, serial: Optional[Union[str, adbutils.AdbDevice]] = None, prefer_supershell: bool = False):
         """
         Args:
             serial: device serialno
+            prefer_supershell: run shell commands through superShell JSON-RPC (root) even in ADB mode
         """
+        self._prefer_supershell = prefer_supershell
         if isinstance(serial, adbutils.AdbDevice):
             self.__serial = serial.serial
             self._dev = serial
@@ -146,7 +217,7 @@ class _BaseClient(BasicUiautomatorServer):
     
     def _wait_for_device(self, timeout=10) -> adbutils.AdbDevice:
         """
-        wait for device came online, if device is remote, reconnect every 1s
+        wait for device came online, if device is remote, reconnect it once first
 
         Returns:
             adbutils.AdbDevice
@@ -154,32 +225,31 @@ class _BaseClient(BasicUiautomatorServer):
         Raises:
             ConnectError
         """
-        for d in adbutils.adb.device_list():
-            if d.serial == self._serial:
-                return d
-
-        _RE_remote_adb = re.compile(r"^\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}:\d+$")
-        _is_remote = _RE_remote_adb.match(self._serial) is not None
-
         adb = adbutils.adb
-        deadline = time.time() + timeout
-        while time.time() < deadline:
-            title = "device reconnecting" if _is_remote else "wait-for-device"
-            logger.debug("%s, time left(%.1fs)", title, deadline - time.time())
-            if _is_remote:
-                try:
-                    adb.disconnect(self._serial)
-                    adb.connect(self._serial, timeout=1)
-                except (adbutils.AdbError, adbutils.AdbTimeout) as e:
-                    logger.debug("adb reconnect error: %s", str(e))
-                    time.sleep(1.0)
-                    continue
+        devices = {d.serial: d for d in adb.device_list()}
+        if self._serial in devices:
+            return devices[self._serial]
+
+        deadline = time.monotonic() + timeout
+        if _RE_REMOTE_ADB.match(self._serial):
+            logger.debug("device reconnecting: %s", self._serial)
             try:
-                adb.wait_for(self._serial, timeout=1)
-            except (adbutils.AdbError, adbutils.AdbTimeout):
-                continue
-            return adb.device(self._serial)
-        raise ConnectError(f"device {self._serial} not online")
+                adb.disconnect(self._serial)
+                # "connected to ..." or "already connected to ...", otherwise "unable/failed to connect ..."
+                output = adb.connect(self._serial, timeout=min(timeout, 5))
+            except (adbutils.AdbError, adbutils.AdbTimeout) as e:
+                raise ConnectError(f"device {self._serial} not online: {e}")
+            if "connected to" not in output:
+                raise ConnectError(f"device {self._serial} not online: {output}")
+
+        time_left = max(deadline - time.monotonic(), 0.1)
+        logger.debug("wait-for-device, time left(%.1fs)", time_left)
+        try:
+            # the adb server does the waiting, no polling from here
+            adb.wait_for(self._serial, timeout=time_left)
+        except (adbutils.AdbError, adbutils.AdbTimeout):
+            raise ConnectError(f"device {self._serial} not online")
+        return adb.device(self._serial)
 
     @property
     def adb_device(self) -> Optional[adbutils.AdbDevice]:
@@ -198,7 +268,7 @@ class _BaseClient(BasicUiautomatorServer):
         """
         Run shell command on device
         In WiFi mode, uses superShell JSON-RPC method (requires root)
-        In ADB mode, uses ADB shell
+        In ADB mode, uses ADB shell, or superShell when prefer_supershell is set
 
         Args:
             cmdargs: str or list, example: "ls -l" or ["ls", "-l"]
@@ -211,64 +281,64 @@ class _BaseClient(BasicUiautomatorServer):
             AdbShellError
         """
         try:
-            if self.debug:
-                print("shell:", list2cmdline(cmdargs))
-            logger.debug("shell: %s", list2cmdline(cmdargs))
-            
-            # Convert cmdargs to string if it's a list
-            if isinstance(cmdargs, list):
+            # WiFi mode has no ADB device, superShell is the only way to run commands
+            use_supershell = getattr(self, '_dev', None) is None or self._prefer_supershell
+            log_debug = logger.isEnabledFor(logging.DEBUG)
+            # adb shell2 takes the list as is, only quote it when the string is needed
+            if use_supershell or self.debug or log_debug:
                 cmd_str = list2cmdline(cmdargs)
-            else:
-                cmd_str = cmdargs
-            
-            # Check if we're in WiFi mode (no ADB device)
-            is_wifi_mode = not hasattr(self, '_dev') or self._dev is None
-            
-            # Try superShell JSON-RPC method first (for WiFi mode or root commands)
-            try:
-                result = self.jsonrpc.superShell(cmd_str)
+                if self.debug:
+                    print("shell:", cmd_str)
+                if log_debug:
+                    logger.debug("shell: %s", cmd_str)
+
+            if use_supershell:
+                try:
+                    result = self.jsonrpc.superShell(cmd_str)
+                except Exception as e:
+                    logger.error("superShell failed: %s", e)
+                    raise AdbShellError(f"superShell failed: {e}")
                 # superShell returns string output, assume success (exit code 0)
                 return ShellResponse(result, 0)
-            except (AttributeError, KeyError, Exception) as e:
-                # If superShell is not available
-                if is_wifi_mode:
-                    # WiFi mode: superShell is required, cannot fall back to ADB
-                    logger.error("superShell failed in WiFi mode: %s", e)
-                    raise AdbShellError(f"superShell failed in WiFi mode: {e}")
-                else:
-                    # ADB mode: fall back to ADB shell
-                    logger.debug("superShell not available, falling back to ADB shell: %s", e)
-                    if hasattr(self, '_dev') and self._dev:
-                        ret = self._dev.shell2(cmdargs, timeout=timeout)
-                        return ShellResponse(ret.output, ret.returncode)
-                    else:
-                        raise AdbShellError("Neither superShell nor ADB shell available")
+
+            ret = self._dev.shell2(cmdargs, timeout=timeout)
+            return ShellResponse(ret.output, ret.returncode)
         except adbutils.AdbError as e:
             raise AdbShellError(e)
 
     @property
     def info(self) -> Dict[str, Any]:
-        return self.jsonrpc.deviceInfo(http_timeout=10)
+        """Get device info via JSON-RPC, reused for INFO_CACHE_TTL seconds"""
+        now = time.monotonic()
+        cache = self._info_cache
+        if cache is not None and now - cache[0] < INFO_CACHE_TTL:
+            return dict(cache[1])  # a copy, so callers can't modify the cached dict
+        info = self.jsonrpc.deviceInfo(http_timeout=10)
+        self._info_cache = (now, info)
+        return dict(info)
     
-    @property
+    @cached_property
     def device_info(self) -> Dict[str, Any]:
+        """ serial, sdk, brand, model, arch, version of the device, fetched once since they never change """
         if self._dev is None:
             # WiFi mode: get info via JSON-RPC
             info = self.jsonrpc.deviceInfo()
+            product_name = info.get('productName') or ''
             return {
                 "serial": "wifi_mode",
                 "sdk": info.get('sdkInt'),
-                "brand": info.get('productName', '').split('_')[0] if '_' in info.get('productName', '') else '',
-                "model": info.get('productName', ''),
+                "brand": product_name.partition('_')[0] if '_' in product_name else '',
+                "model": product_name,
                 "arch": None,
                 "version": info.get('sdkInt'),
             }
-        serial = self._dev.getprop("ro.serialno")
-        sdk = self._dev.getprop("ro.build.version.sdk")
-        version = self._dev.getprop("ro.build.version.release")
-        brand = self._dev.getprop("ro.product.brand")
-        model = self._dev.getprop("ro.product.model")
-        arch = self._dev.getprop("ro.product.cpu.abi")
+        # one shell invocation for all props, each value printed on its own line
+        props = ("ro.serialno", "ro.build.version.sdk", "ro.build.version.release",
+                 "ro.product.brand", "ro.product.model", "ro.product.cpu.abi")
+        output = self._dev.shell("; ".join(f"getprop {name}" for name in props))
+        values = [line.strip() for line in output.split("\n")]
+        values += [""] * (len(props) - len(values))  # trailing empty values are stripped by adb shell
+        serial, sdk, version, brand, model, arch = values[:len(props)]
         return {
             "serial": serial,
             "sdk": int(sdk) if sdk.isdigit() else None,
@@ -287,22 +357,8 @@ class _BaseClient(BasicUiautomatorServer):
         except adbutils.AdbError:
             return None
 
-    @property
-    def jsonrpc(self):
-        class JSONRpcWrapper():
-            def __init__(self, server: BasicUiautomatorServer):
-                self.server = server
-                self.method = None
-
-            def __getattr__(self, method):
-                self.method = method  # jsonrpc function name
-                return self
-
-            def __call__(self, *args, **kwargs):
-                http_timeout = kwargs.pop('http_timeout', HTTP_TIMEOUT)
-                params = args if args else kwargs
-                return self.server.jsonrpc_call(self.method, params, http_timeout)
-
+    @cached_property
+    def jsonrpc(self) -> JSONRpcWrapper:
         return JSONRpcWrapper(self)
 
     def reset_uiautomator(self):
@@ -318,6 +374,7 @@ class _BaseClient(BasicUiautomatorServer):
         Note:
             WiFi mode: Server should be managed externally, this method only checks connectivity
         """
+        self._info_cache = None
         # WiFi mode: just check if server is alive
         if not hasattr(self, '_dev') or self._dev is None:
             self.start_uiautomator()  # This will check if server is alive
@@ -5,48 +5,174 @@
 """
 
 import atexit
+import collections
 import datetime
 import hashlib
+import ipaddress
 import json
 import logging
+import math
 import os
+import selectors
+import shlex
 import socket
+import sys
 import threading
 import time
-from http.client import HTTPConnection
+from functools import cached_property
+from http.client import HTTPConnection, HTTPException, IncompleteRead, RemoteDisconnected, \
+    HTTPResponse as _HTTPClientResponse
 from pathlib import Path
-from typing import Any, Dict, Optional, Union, Tuple
+from typing import Any, Callable, Deque, Dict, List, Optional, Union, Tuple
 
 import adbutils
-import requests
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, fall back to the stdlib json
+    orjson = None
 
 from uiautomator2.abstract import AbstractUiautomatorServer
 from uiautomator2.exceptions import AccessibilityServiceAlreadyRegisteredError, APKSignatureError, ConnectError, HTTPError, \
-    HTTPTimeoutError, LaunchUiAutomationError, RPCInvalidError, RPCStackOverflowError, RPCUnknownError, \
-    UiAutomationNotConnectedError, UiObjectNotFoundError
+    HTTPTimeoutError, LaunchUiAutomationError, RPCError, RPCInvalidError, RPCStackOverflowError, RPCUnknownError, \
+    UiAutomationError, UiAutomationNotConnectedError, UiObjectNotFoundError
 from uiautomator2.utils import with_package_resource
 from uiautomator2.version import __apk_version__
 
 logger = logging.getLogger(__name__)
 
+
+def _stdlib_json_dumps(obj: Any) -> bytes:
+    return json.dumps(obj).encode("utf-8")
+
+
+def _has_non_finite_float(obj: Any) -> bool:
+    if isinstance(obj, float):
+        return not math.isfinite(obj)
+    if isinstance(obj, dict):
+        return any(_has_non_finite_float(v) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return any(_has_non_finite_float(v) for v in obj)
+    return False
+
+
+if orjson is not None:
+    # dataclasses and datetimes go through default=None and fail, so the stdlib decides about them too
+    _ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def _json_dumps(obj: Any) -> bytes:
+        """orjson, with the stdlib json output wherever the two differ
+        
+        orjson rejects namedtuples, non-str dict keys and ints above 64 bits, and writes NaN/inf as null.
+        """
+        try:
+            data = orjson.dumps(obj, option=_ORJSON_OPTIONS)
+        except TypeError:  # orjson.JSONEncodeError
+            return _stdlib_json_dumps(obj)
+        # most payloads have no null at all, only those are searched for NaN/inf
+        if b"null" in data and _has_non_finite_float(obj):
+            return _stdlib_json_dumps(obj)
+        return data
+    _json_loads = orjson.loads
+else:
+    _json_dumps = _stdlib_json_dumps
+    _json_loads = json.loads
+
+class _ProcessOutputReader:
+    """Drain the output of all launched uiautomator processes from a single daemon thread
+    
+    Each process keeps its adb shell connection open for its whole life, so a blocking reader per process
+    would pin one thread per launch. The connections are multiplexed with selectors instead.
+    """
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._pending: List[Tuple[socket.socket, "MockAdbProcess"]] = []
+        self._wakeup: Optional[socket.socket] = None
+
+    def add(self, sock: socket.socket, process: "MockAdbProcess"):
+        with self._lock:
+            if self._wakeup is None:
+                wakeup_r, self._wakeup = socket.socketpair()
+                t = threading.Thread(target=self._run, args=(wakeup_r,))
+                t.daemon = True
+                t.name = "wait_adb_conn"
+                t.start()
+            # registered by the reader thread, the selector is only touched from there
+            self._pending.append((sock, process))
+            self._wakeup.send(b"\0")
+
+    def _run(self, wakeup: socket.socket):
+        selector = selectors.DefaultSelector()
+        selector.register(wakeup, selectors.EVENT_READ)
+        while True:
+            try:
+                events = selector.select()
+            except (OSError, ValueError) as e:
+                # a socket was closed while still registered, one bad socket must not stop draining the others
+                logger.debug("MockAdbProcess select error: %s", e)
+                self._drop_closed(selector, wakeup)
+                continue
+            for key, _ in events:
+                if key.fileobj is wakeup:
+                    wakeup.recv(1024)
+                    with self._lock:
+                        pending, self._pending = self._pending, []
+                    for sock, process in pending:
+                        self._register(selector, sock, process)
+                    continue
+                process: MockAdbProcess = key.data
+                try:
+                    chunk = key.fileobj.recv(1024)
+                except Exception:
+                    chunk = b""
+                if chunk:
+                    process._on_output(chunk)
+                else:
+                    selector.unregister(key.fileobj)
+                    process._on_finished()
+
+    @staticmethod
+    def _drop_closed(selector: selectors.BaseSelector, wakeup: socket.socket):
+        closed = [key for key in selector.get_map().values()
+                  if key.fileobj is not wakeup and key.fileobj.fileno() == -1]
+        if not closed:
+            # nothing to drop, do not spin on a persistent error
+            time.sleep(0.1)
+        for key in closed:
+            selector.unregister(key.fileobj)
+            key.data._on_finished()
+
+    @staticmethod
+    def _register(selector: selectors.BaseSelector, sock: socket.socket, process: "MockAdbProcess"):
+        try:
+            try:
+                selector.register(sock, selectors.EVENT_READ, process)
+            except KeyError:
+                # fd number reused after a connection was closed without being unregistered
+                selector.unregister(sock.fileno())
+                selector.register(sock, selectors.EVENT_READ, process)
+        except (KeyError, ValueError, OSError) as e:
+            # already closed
+            logger.debug("MockAdbProcess register error: %s", e)
+            process._on_finished()
+
+
+_output_reader = _ProcessOutputReader()
+
+
 class MockAdbProcess:
     def __init__(self, conn: adbutils.AdbConnection) -> None:
         self._conn = conn
         self._event = threading.Event()
         self._output = bytearray()
-        def wait_finished():
-            try:
-                while chunk := self._conn.conn.recv(1024):
-                    logger.debug("MockAdbProcess: %s", chunk)
-                    self._output.extend(chunk)
-            except:
-                pass
-            self._event.set()
-        
-        t = threading.Thread(target=wait_finished)
-        t.daemon = True
-        t.name = "wait_adb_conn"
-        t.start()
+        _output_reader.add(self._conn.conn, self)
+
+    def _on_output(self, chunk: bytes):
+        logger.debug("MockAdbProcess: %s", chunk)
+        self._output.extend(chunk)
+
+    def _on_finished(self):
+        self._event.set()
     
     @property
     def output(self) -> bytes:
@@ -62,8 +188,13 @@ class MockAdbProcess:
         return None
 
     def kill(self):
-        self._conn.close()
+        # shutdown wakes the reader thread with EOF, close only after it has unregistered the socket
+        try:
+            self._conn.conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
         self.wait()
+        self._conn.close()
 
 
 def launch_uiautomator(dev: adbutils.AdbDevice) -> MockAdbProcess:
@@ -76,28 +207,95 @@ def launch_uiautomator(dev: adbutils.AdbDevice) -> MockAdbProcess:
 
 
 class HTTPResponse:
-    def __init__(self, content: bytes) -> None:
+    def __init__(self, content: Union[bytes, bytearray]) -> None:
         self.content = content
     
     def json(self):
-        return json.loads(self.content)
+        return _json_loads(self.content)
 
-    @property
+    @cached_property
     def text(self):
+        """ decoded at most once, the content never changes """
         return self.content.decode("utf-8", errors="ignore")
 
 
+# unacknowledged data older than this aborts a WiFi connection, so a phone that dropped off the network
+# fails fast instead of after the full request timeout. Slow jsonrpc calls are unaffected, the phone still ACKs.
+TCP_USER_TIMEOUT_MS = 10000
+
+
+def _set_socket_options(sock: socket.socket, user_timeout_ms: Optional[int] = None):
+    """ disable Nagle for small request/response writes and enable TCP keepalive """
+    try:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        if user_timeout_ms and hasattr(socket, "TCP_USER_TIMEOUT"):  # Linux only
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_USER_TIMEOUT, user_timeout_ms)
+    except OSError as e:
+        logger.debug("set socket options error: %s", e)
+
+
+def _adb_server_is_local(device: adbutils.AdbDevice) -> bool:
+    """adb forward listens on the adb server host, which is only reachable as 127.0.0.1 when it is this machine"""
+    host = getattr(getattr(device, "_client", None), "host", None) or \
+        os.environ.get("ANDROID_ADB_SERVER_HOST", "127.0.0.1")
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class _AdbForward:
+    """adb forward tcp:<local port> tcp:<device port>, set up on first use and again after a failed connect"""
+    def __init__(self, device: adbutils.AdbDevice, port: int) -> None:
+        self._device = device
+        self._port = port
+        self._lock = threading.Lock()
+        self._local_port: Optional[int] = None
+
+    def get(self) -> int:
+        """ return the local port """
+        with self._lock:
+            if self._local_port is None:
+                self._local_port = self._device.forward_port(self._port)
+            return self._local_port
+
+    def remove(self):
+        """ remove the forward from the adb server, the next get() sets up a new one """
+        with self._lock:
+            local_port, self._local_port = self._local_port, None
+            if local_port is None:
+                return
+            try:
+                self._device.forward_remove(f"tcp:{local_port}", raise_non_found=False)
+            except (adbutils.AdbError, OSError) as e:
+                logger.debug("adb forward remove error: %s", e)
+
+
 class AdbHTTPConnection(HTTPConnection):
-    def __init__(self, device: adbutils.AdbDevice, port=9008):
+    def __init__(self, device: adbutils.AdbDevice, port=9008, forward: Optional[_AdbForward] = None):
         super().__init__("localhost", port)
         self.__device = device
         self.__port = port
+        # with a forward, connect to its local port directly instead of asking the adb server for a new transport
+        self.__forward = forward
 
     def connect(self):
-        try:
-            self.sock = self.__device.create_connection(adbutils.Network.TCP, self.__port)
-        except adbutils.AdbError as e:
-            raise HTTPError(f"Unable to connect to uiautomator2 server: {e}") from e
+        if self.__forward is not None:
+            try:
+                self.sock = socket.create_connection(("127.0.0.1", self.__forward.get()), timeout=self.timeout)
+            except (adbutils.AdbError, OSError) as e:
+                # the forward is gone, e.g. the adb server restarted, remove it so the next connect forwards again
+                self.__forward.remove()
+                raise HTTPError(f"Unable to connect to uiautomator2 server: {e}") from e
+        else:
+            try:
+                self.sock = self.__device.create_connection(adbutils.Network.TCP, self.__port)
+            except adbutils.AdbError as e:
+                raise HTTPError(f"Unable to connect to uiautomator2 server: {e}") from e
+        _set_socket_options(self.sock)
 
     def __enter__(self) -> HTTPConnection:
         return self
@@ -106,18 +304,49 @@ class AdbHTTPConnection(HTTPConnection):
         self.close()
 
 
+class _ResolvedAddress:
+    """getaddrinfo result of host:port, resolved on first use and again after a failed connect"""
+    def __init__(self, host: str, port: int) -> None:
+        self._host = host
+        self._port = port
+        self._addr: Optional[Tuple[int, Any]] = None
+
+    def get(self) -> Tuple[int, Any]:
+        """ return (family, sockaddr) """
+        addr = self._addr
+        if addr is None:
+            family, _, _, _, sockaddr = socket.getaddrinfo(self._host, self._port, type=socket.SOCK_STREAM)[0]
+            addr = self._addr = (family, sockaddr)
+        return addr
+
+    def invalidate(self):
+        self._addr = None
+
+
 class WiFiHTTPConnection(HTTPConnection):
     """Direct TCP connection for WiFi mode (no ADB)"""
-    def __init__(self, host: str, port: int = 9008):
+    def __init__(self, host: str, port: int = 9008, address: Optional[_ResolvedAddress] = None):
         super().__init__(host, port)
         self.__host = host
         self.__port = port
+        # share one address between connections so the host name is not resolved on every connect
+        self.__address = address or _ResolvedAddress(host, port)
 
     def connect(self):
+        sock = None
         try:
-            sock = socket.create_connection((self.__host, self.__port), timeout=self.timeout)
+            family, sockaddr = self.__address.get()
+            sock = socket.socket(family, socket.SOCK_STREAM)
+            if self.timeout is not socket._GLOBAL_DEFAULT_TIMEOUT:
+                sock.settimeout(self.timeout)
+            sock.connect(sockaddr)
+            _set_socket_options(sock, TCP_USER_TIMEOUT_MS)
             self.sock = sock
         except (socket.error, OSError) as e:
+            if sock is not None:
+                sock.close()
+            # the address may be stale, e.g. the device got a new IP
+            self.__address.invalidate()
             raise HTTPError(f"Unable to connect to uiautomator2 server at {self.__host}:{self.__port}: {e}") from e
 
     def __enter__(self) -> HTTPConnection:
@@ -127,12 +356,126 @@ class WiFiHTTPConnection(HTTPConnection):
         self.close()
 
 
-def _http_request(connection_info: Union[adbutils.AdbDevice, Tuple[str, int]], device_port: int, method: str, path: str, data: Optional[Dict[str, Any]] = None, timeout=10.0, print_request: bool = False) -> HTTPResponse:
+def _send_request(conn: HTTPConnection, method: str, path: str, body: Optional[bytes], headers: Dict[str, str], timeout: float):
+    """Send one request over conn, the response is read with conn.getresponse()"""
+    conn.timeout = timeout
+    if conn.sock is not None:
+        # reused keep-alive connection, timeout only applies to new sockets
+        conn.sock.settimeout(timeout)
+    conn.request(method, path, body, headers=headers)
+
+
+# bodies at least this large are read into a preallocated buffer, e.g. dumpWindowHierarchy results
+READINTO_THRESHOLD = 64 * 1024
+
+
+def _read_body(_response: _HTTPClientResponse) -> Union[bytes, bytearray]:
+    """Read the whole response body
+    
+    A large body with a known Content-Length is received straight into one bytearray,
+    which avoids the copies of joining the chunks read() collects.
+    Chunked or small bodies use a single read() call.
+    """
+    n = _response.length  # None for chunked encoding
+    if n is None or n < READINTO_THRESHOLD:
+        return _response.read()
+    buf = bytearray(n)
+    mv = memoryview(buf)
+    off = 0
+    while off < n:
+        got = _response.readinto(mv[off:])
+        if not got:
+            raise IncompleteRead(bytes(mv[:off]), n - off)
+        off += got
+    return buf
+
+
+class _ConnectionPool:
+    """Keep HTTP/1.1 connections to uiautomator2 server alive between requests
+    
+    An idle connection is reused by the next request, which saves the TCP handshake on every jsonrpc call.
+    A thread finding no idle connection opens a new one, so concurrent requests never wait on each other.
+    Up to max_idle connections are kept, the most recently used one is handed out first.
+    """
+    def __init__(self, factory: Callable[[], HTTPConnection], base_url: str, max_idle: int = 4) -> None:
+        self._factory = factory
+        self.base_url = base_url  # only used in print_request output
+        self._max_idle = max_idle
+        self._lock = threading.Lock()
+        self._idle: Deque[HTTPConnection] = collections.deque()
+
+    def _acquire(self) -> Tuple[HTTPConnection, bool]:
+        """ return (connection, is_reused) """
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            return self._factory(), False
+        return conn, True
+
+    def _release(self, conn: HTTPConnection):
+        with self._lock:
+            if len(self._idle) < self._max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def request(self, method: str, path: str, body: Optional[bytes], headers: Dict[str, str], timeout: float) -> Tuple[_HTTPClientResponse, Union[bytes, bytearray]]:
+        conn, reused = self._acquire()
+        while True:
+            sent = False
+            try:
+                _send_request(conn, method, path, body, headers, timeout)
+                sent = True
+                _response = conn.getresponse()
+                # the body is always drained so the keep-alive connection stays usable
+                content = _read_body(_response)
+                break
+            except ConnectionError as e:
+                conn.close()
+                # a request the server may have run is never sent twice, e.g. a click must not happen twice.
+                # Only a failed write, or an idle connection closed before any reply, is retried
+                if not reused or (sent and not isinstance(e, RemoteDisconnected)):
+                    raise
+                # the server closed the idle connection, retry once with a new one
+                conn, reused = self._factory(), False
+            except BaseException:
+                conn.close()
+                raise
+        if _response.will_close:
+            conn.close()
+        else:
+            self._release(conn)
+        return _response, content
+
+    def close(self):
+        with self._lock:
+            conns = list(self._idle)
+            self._idle.clear()
+        for conn in conns:
+            conn.close()
+
+
+def _clock(t: datetime.datetime) -> str:
+    """ HH:MM:SS.mmm, used in print_request output """
+    return f"{t.hour:02d}:{t.minute:02d}:{t.second:02d}.{t.microsecond // 1000:03d}"
+
+
+# Accept-Encoding identity avoids gzip compression, nanohttpd gzip has resource leaks
+# https://github.com/NanoHttpd/nanohttpd/issues/492
+# https://blog.csdn.net/fcp12138/article/details/80436644
+_REQUEST_HEADERS = {
+    'User-Agent': 'uiautomator2',
+    'Accept-Encoding': 'identity',
+    'Content-Type': 'application/json',
+    'Connection': 'keep-alive',
+}
+
+
+def _http_request(pool: _ConnectionPool, method: str, path: str, data: Optional[Union[Dict[str, Any], List[Dict[str, Any]]]] = None, timeout=10.0, print_request: bool = False) -> HTTPResponse:
     """Send http request to uiautomator2 server
     
     Args:
-        connection_info: Either adbutils.AdbDevice (for ADB mode) or Tuple[str, int] (host, port) for WiFi mode
-        device_port: Port number (used for ADB mode, ignored in WiFi mode)
+        pool: keep-alive connections to the server, ADB or WiFi mode is decided by the pool's connection factory
         method: HTTP method
         path: HTTP path
         data: Request data
@@ -142,72 +485,34 @@ def _http_request(connection_info: Union[adbutils.AdbDevice, Tuple[str, int]], d
     try:
         logger.debug("http request %s %s %s", method, path, data)
         
-        # Determine connection mode
-        is_wifi_mode = isinstance(connection_info, tuple)
-        
-        if is_wifi_mode:
-            host, port = connection_info
-            url = f"http://{host}:{port}{path}"
-        else:
-            url = f"http://127.0.0.1:{device_port}{path}"
-        
-        # 移除调试输出，只在 print_request=True 时输出
-        # print(f"curl -X {method} {url} -d '{json.dumps(data) if data else 'null'}'")
+        # serialized once, the debug print below reuses it
+        body = _json_dumps(data) if data else None
         
         if print_request:
             start_time = datetime.datetime.now()
-            current_time = start_time.strftime("%H:%M:%S.%f")[:-3]
-            fields = [current_time, f"$ curl -X {method}", url]
-            if data:
-                fields.append(f"-d '{json.dumps(data)}'")
-            print(f"# http timeout={timeout}")
-            print(" ".join(fields))
+            fields = [_clock(start_time), f"$ curl -X {method}", pool.base_url + path]
+            if body:
+                fields.append(f"-d '{body.decode()}'")
+            sys.stdout.write(f"# http timeout={timeout}\n{' '.join(fields)}\n")
         
-        # set Accept-Encoding to empty to avoid gzip compression
-        # nanohttpd gzip has resource leaks
-        # https://github.com/NanoHttpd/nanohttpd/issues/492
-        # https://blog.csdn.net/fcp12138/article/details/80436644
-        headers = {
-            'User-Agent': 'uiautomator2',
-            'Accept-Encoding': '',
-            'Content-Type': 'application/json'
-        }
-        
-        # Choose connection type
-        if is_wifi_mode:
-            host, port = connection_info
-            conn = WiFiHTTPConnection(host, port)
-        else:
-            conn = AdbHTTPConnection(connection_info, port=device_port)
-        
-        with conn:
-            conn.timeout = timeout
-            if not data:
-                conn.request(method, path, headers=headers)
-            else:
-                conn.request(method, path, json.dumps(data), headers=headers)
-            _response = conn.getresponse()
-            content = bytearray()
-            while chunk := _response.read(4096):
-                content.extend(chunk)
-            if _response.status != 200:
-                raise HTTPError(f"HTTP request failed: {_response.status} {_response.reason}")
-            response = HTTPResponse(content)
-        # print(f"-->{response.text.rstrip()}\n")
+        _response, content = pool.request(method, path, body, _REQUEST_HEADERS, timeout)
+        if _response.status != 200:
+            raise HTTPError(f"HTTP request failed: {_response.status} {_response.reason}")
+        response = HTTPResponse(content)
         if print_request:
             end_time = datetime.datetime.now()
-            current_time = end_time.strftime("%H:%M:%S.%f")[:-3]
-            print(f"{current_time} Response >>>")
-            print(response.text.rstrip())
-            print(f"<<< END timed_used = %.3f\n" % (end_time - start_time).total_seconds())
+            time_used = (end_time - start_time).total_seconds()
+            sys.stdout.write(f"{_clock(end_time)} Response >>>\n{response.text.rstrip()}\n<<< END timed_used = {time_used:.3f}\n\n")
         return response
-    except requests.Timeout as e:
+    except (socket.timeout, TimeoutError) as e:
+        # socket.timeout is only an alias of TimeoutError since python 3.10
         raise HTTPTimeoutError(f"HTTP request timeout: {e}") from e
-    except requests.RequestException as e:
+    except (ConnectionError, HTTPException) as e:
+        # e.g. adb forward accepted the connection but the server on the device is not listening
         raise HTTPError(f"HTTP request failed: {e}") from e
 
 
-def _jsonrpc_call(connection_info: Union[adbutils.AdbDevice, Tuple[str, int]], device_port: int, method: str, params: Any, timeout: float, print_request: bool) -> Any:
+def _jsonrpc_call(pool: _ConnectionPool, method: str, params: Any, timeout: float, print_request: bool) -> Any:
     """Send jsonrpc call to uiautomator2 server
     
     Raises:
@@ -219,8 +524,81 @@ def _jsonrpc_call(connection_info: Union[adbutils.AdbDevice, Tuple[str, int]], d
         "method": method,
         "params": params
     }
-    r = _http_request(connection_info, device_port, "POST", "/jsonrpc/0", payload, timeout=timeout, print_request=print_request)
+    r = _http_request(pool, "POST", "/jsonrpc/0", payload, timeout=timeout, print_request=print_request)
+    return _parse_jsonrpc_response(r.json(), params, r.content)
+
+
+def _jsonrpc_call_batch(pool: _ConnectionPool, calls: List[Tuple[str, Any]], timeout: float, print_request: bool, return_exceptions: bool = False) -> List[Any]:
+    """Send multiple jsonrpc calls to uiautomator2 server in one http request (JSON-RPC 2.0 batch)
+    
+    Args:
+        calls: list of (method, params)
+        return_exceptions: put the error of a failed call into the result list instead of raising it
+    
+    Returns:
+        results in the same order as calls
+    
+    Raises:
+        UiAutomationError
+    """
+    if not calls:
+        return []
+    payload = [{
+        "jsonrpc": "2.0",
+        "id": rpc_id,
+        "method": method,
+        "params": params
+    } for rpc_id, (method, params) in enumerate(calls, 1)]
+    r = _http_request(pool, "POST", "/jsonrpc/0", payload, timeout=timeout, print_request=print_request)
     data = r.json()
+    if isinstance(data, dict):
+        # the whole batch is rejected, e.g. parse error
+        _parse_jsonrpc_response(data, None, r.content)
+    if not isinstance(data, list):
+        raise RPCInvalidError("Unknown RPC error: batch response is not a list")
+    
+    # responses in a batch may come back in any order
+    responses = {item.get("id"): item for item in data if isinstance(item, dict)}
+    results = []
+    for rpc_id, (method, params) in enumerate(calls, 1):
+        try:
+            if rpc_id not in responses:
+                raise RPCInvalidError(f"Unknown RPC error: no response for {method}")
+            item = responses[rpc_id]
+            results.append(_parse_jsonrpc_response(item, params))
+        except (RPCError, UiAutomationError) as e:
+            if not return_exceptions:
+                raise
+            results.append(e)
+    return results
+
+
+# (substring of the error message, factory(code, message, params, stacktrace)), checked in order
+_RPC_ERROR_TABLE: Tuple[Tuple[str, Callable[[Any, str, Any, Any], Exception]], ...] = (
+    # https://developer.android.com/reference/android/os/DeadObjectException
+    ("android.os.DeadObjectException",
+     lambda code, message, params, stacktrace: UiAutomationNotConnectedError("android.os.DeadObjectException")),
+    ("android.os.DeadSystemRuntimeException",
+     lambda code, message, params, stacktrace: UiAutomationNotConnectedError("android.os.DeadSystemRuntimeException")),
+    ("uiautomator.UiObjectNotFoundException",
+     lambda code, message, params, stacktrace: UiObjectNotFoundError(code, message, params)),
+    ("java.lang.StackOverflowError",
+     lambda code, message, params, stacktrace: RPCStackOverflowError(
+         f"StackOverflowError: {message}", params, stacktrace[:1000] + "..." + stacktrace[-1000:])),
+)
+
+
+def _parse_jsonrpc_response(data: Any, params: Any, content: Optional[Union[bytes, bytearray]] = None) -> Any:
+    """Return the result field of a jsonrpc response
+    
+    Args:
+        data: decoded jsonrpc response
+        params: params of the request, used in error messages
+        content: raw response body of data, None for an item of a batch response
+    
+    Raises:
+        UiAutomationError
+    """
     if not isinstance(data, dict):
         raise RPCInvalidError("Unknown RPC error: not a dict")
     
@@ -229,17 +607,17 @@ def _jsonrpc_call(connection_info: Union[adbutils.AdbDevice, Tuple[str, int]], d
         code = data['error'].get('code')
         message = data['error'].get('message', '')
         stacktrace = data['error'].get('data')
-        if "UiAutomation not connected" in r.text:
+        if content is not None:
+            not_connected = b"UiAutomation not connected" in content
+        else:
+            # batch item, the raw body also holds the other responses, search the error fields instead
+            not_connected = "UiAutomation not connected" in message or \
+                "UiAutomation not connected" in (stacktrace if isinstance(stacktrace, str) else "")
+        if not_connected:
             raise UiAutomationNotConnectedError("UiAutomation not connected")
-        if "android.os.DeadObjectException" in message:
-            # https://developer.android.com/reference/android/os/DeadObjectException
-            raise UiAutomationNotConnectedError("android.os.DeadObjectException")
-        if "android.os.DeadSystemRuntimeException" in message:
-            raise UiAutomationNotConnectedError("android.os.DeadSystemRuntimeException")
-        if "uiautomator.UiObjectNotFoundException" in message:
-            raise UiObjectNotFoundError(code, message, params)
-        if "java.lang.StackOverflowError" in message:
-            raise RPCStackOverflowError(f"StackOverflowError: {message}", params, stacktrace[:1000] + "..." + stacktrace[-1000:])
+        for token, make_error in _RPC_ERROR_TABLE:
+            if token in message:
+                raise make_error(code, message, params, stacktrace)
         raise RPCUnknownError(f"Unknown RPC error: {code} {message}", params, stacktrace)
     
     if "result" not in data:
@@ -247,13 +625,34 @@ def _jsonrpc_call(connection_info: Union[adbutils.AdbDevice, Tuple[str, int]], d
     return data["result"]
 
 
+_file_md5_cache: Dict[Tuple[str, int, int], str] = {}
+
+
+def _file_md5(path: Union[str, Path]) -> str:
+    """md5 hexdigest of a local file, read in chunks and cached until the file changes"""
+    st = os.stat(path)
+    key = (os.fspath(path), st.st_mtime_ns, st.st_size)
+    digest = _file_md5_cache.get(key)
+    if digest is None:
+        with open(path, "rb") as f:
+            if hasattr(hashlib, "file_digest"):  # Python 3.11+, hashes in C without the GIL
+                md5 = hashlib.file_digest(f, "md5")
+            else:
+                md5 = hashlib.md5()
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    md5.update(chunk)
+        digest = _file_md5_cache[key] = md5.hexdigest()
+    return digest
+
+
 class WiFiUiautomatorServer(AbstractUiautomatorServer):
     """WiFi mode uiautomator2 server client (no ADB required)"""
     def __init__(self, host: str, port: int = 9008) -> None:
         self._host = host
         self._port = port
         self._debug = False
-        self._connection_info = (host, port)
+        address = _ResolvedAddress(host, port)
+        self._pool = _ConnectionPool(lambda: WiFiHTTPConnection(host, port, address), f"http://{host}:{port}")
         # Check if server is alive
         self._check_alive()
     
@@ -268,7 +667,7 @@ class WiFiUiautomatorServer(AbstractUiautomatorServer):
     def _check_alive(self) -> bool:
         """Check if uiautomator2 server is alive"""
         try:
-            _http_request(self._connection_info, self._port, "GET", "/ping", timeout=2.0)
+            _http_request(self._pool, "GET", "/ping", timeout=2.0)
             return True
         except Exception as e:
             logger.error(f"uiautomator2 server at {self._host}:{self._port} is not alive: {e}")
@@ -284,7 +683,11 @@ class WiFiUiautomatorServer(AbstractUiautomatorServer):
     
     def jsonrpc_call(self, method: str, params: Any = None, timeout: float = 10.0) -> Any:
         """Call JSON-RPC method"""
-        return _jsonrpc_call(self._connection_info, self._port, method, params, timeout, self._debug)
+        return _jsonrpc_call(self._pool, method, params, timeout, self._debug)
+    
+    def jsonrpc_call_batch(self, calls: List[Tuple[str, Any]], timeout: float = 10.0, return_exceptions: bool = False) -> List[Any]:
+        """Call multiple JSON-RPC methods in one round trip, return results in order"""
+        return _jsonrpc_call_batch(self._pool, calls, timeout, self._debug, return_exceptions)
 
 
 class BasicUiautomatorServer(AbstractUiautomatorServer):
@@ -298,7 +701,11 @@ class BasicUiautomatorServer(AbstractUiautomatorServer):
         self._process = None
         self._debug = False
         self._device_server_port = device_server_port
-        self._connection_info = dev  # ADB device for connection
+        # the forward port is opened on the adb server host, a remote adb server is reached through adb transports
+        self._forward = _AdbForward(dev, device_server_port) if _adb_server_is_local(dev) else None
+        forward = self._forward
+        self._pool = _ConnectionPool(lambda: AdbHTTPConnection(dev, port=device_server_port, forward=forward),
+                                     f"http://127.0.0.1:{device_server_port}")
         self.start_uiautomator()
         atexit.register(self.stop_uiautomator, wait=False)
     
@@ -322,9 +729,16 @@ class BasicUiautomatorServer(AbstractUiautomatorServer):
             if self._process:
                 if self._process.pool() is not None:
                     self._process = None
-            if not self._check_alive():
+            # a launched process that is still running has already passed _wait_ready, no need to ping it
+            if self._process is None and not self._check_alive():
                 self._process = launch_uiautomator(self._dev)
-                self._wait_ready()
+                try:
+                    self._wait_ready()
+                except BaseException:
+                    # never keep a process that is not ready, the next start would skip the ping for it
+                    self._process.kill()
+                    self._process = None
+                    raise
 
     def _setup_jar(self):
         with with_package_resource("assets/u2.jar") as jar_path:
@@ -337,13 +751,14 @@ class BasicUiautomatorServer(AbstractUiautomatorServer):
     
     def _check_device_file_hash(self, local_file: Union[str, Path], remote_file: str) -> bool:
         """ check if remote file hash is correct """
-        md5 = hashlib.md5()
-        with open(local_file, "rb") as f:
-            md5.update(f.read())
-        local_md5 = md5.hexdigest()
+        local_md5 = _file_md5(local_file)
         logger.debug("file %s md5: %s", os.path.basename(local_file), local_md5)
-        output = self._dev.shell(["toybox", "md5sum", remote_file])
-        if "toybox" in output and "not found" in output:
+        # one shell round trip, md5sum reads the whole file from the device storage,
+        # so it only runs when the size matches (a missing file fails the size test too)
+        quoted = shlex.quote(remote_file)
+        output = self._dev.shell(f'[ "$(stat -c %s {quoted})" = "{os.path.getsize(local_file)}" ] && toybox md5sum {quoted}')
+        if "not found" in output:
+            # stat or toybox is missing on old devices
             output = self._dev.shell(["md5", remote_file])
         return local_md5 in output
 
@@ -363,23 +778,25 @@ class BasicUiautomatorServer(AbstractUiautomatorServer):
             SLF4J: Defaulting to no-operation (NOP) logger implementation
             SLF4J: See http://www.slf4j.org/codes.html#StaticLoggerBinder for further details.
         """
-        deadline = time.time() + timeout
-        output_buffer = ''
-        while time.time() < deadline:
-            output = self._process.output.decode("utf-8", errors="ignore")
-            output_buffer += output
-            if "already registered" in output:
-                raise AccessibilityServiceAlreadyRegisteredError(output)
+        deadline = time.monotonic() + timeout
+        delay = 0.1
+        while time.monotonic() < deadline:
+            # output is the whole accumulated bytearray, search it as bytes and decode only for the error
+            output = self._process.output
+            if b"already registered" in output:
+                raise AccessibilityServiceAlreadyRegisteredError(output.decode("utf-8", errors="ignore"))
             if self._process.pool() is not None:
-                raise LaunchUiAutomationError("server quit unexpectly", output_buffer)
+                raise LaunchUiAutomationError("server quit unexpectly", output.decode("utf-8", errors="ignore"))
             if self._check_alive():
                 return
-            time.sleep(.5)
-        raise LaunchUiAutomationError("server not ready", output_buffer)
+            # the server is often up within a few hundred ms, poll fast first and back off to 1s
+            time.sleep(delay)
+            delay = min(delay * 1.5, 1.0)
+        raise LaunchUiAutomationError("server not ready", self._process.output.decode("utf-8", errors="ignore"))
 
     def _check_alive(self) -> bool:
         try:
-            response = _http_request(self._dev, self._device_server_port, "GET", "/ping")
+            response = _http_request(self._pool, "GET", "/ping")
             return response.content == b"pong"
         except HTTPError:
             return False
@@ -394,15 +811,29 @@ class BasicUiautomatorServer(AbstractUiautomatorServer):
             deadline = time.time() + 10
             while time.time() < deadline:
                 if not self._check_alive():
-                    return
+                    break
                 time.sleep(.5)
+        # idle connections point to the server being stopped, the next start_uiautomator forwards again
+        self._pool.close()
+        if self._forward is not None:
+            self._forward.remove()
 
     def jsonrpc_call(self, method: str, params: Any = None, timeout: float = 10) -> Any:
         """Send jsonrpc call to uiautomator2 server"""
         try:
-            return _jsonrpc_call(self._connection_info, self._device_server_port, method, params, timeout, self._debug)
+            return _jsonrpc_call(self._pool, method, params, timeout, self._debug)
+        except (HTTPError, UiAutomationNotConnectedError) as e:
+            logger.debug("uiautomator2 is not ok, error: %s", e)
+            self.stop_uiautomator()
+            self.start_uiautomator()
+            return _jsonrpc_call(self._pool, method, params, timeout, self._debug)
+    
+    def jsonrpc_call_batch(self, calls: List[Tuple[str, Any]], timeout: float = 10, return_exceptions: bool = False) -> List[Any]:
+        """Send multiple jsonrpc calls in one round trip, return results in order"""
+        try:
+            return _jsonrpc_call_batch(self._pool, calls, timeout, self._debug, return_exceptions)
         except (HTTPError, UiAutomationNotConnectedError) as e:
             logger.debug("uiautomator2 is not ok, error: %s", e)
             self.stop_uiautomator()
             self.start_uiautomator()
-            return _jsonrpc_call(self._connection_info, self._device_server_port, method, params, timeout, self._debug)
+            return _jsonrpc_call_batch(self._pool, calls, timeout, self._debug, return_exceptions)
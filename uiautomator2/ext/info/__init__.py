@@ -23,7 +23,7 @@ class Info(object):
             print(os.strerror(e.errno))
 
     def get_basic_info(self):
-        device_info = self._driver.device_info
+        device_info = dict(self._driver.device_info)  # device_info is cached, don't modify it
         app_info = self._driver.app_info(self.pkg_name)
         # query for exact model info
         if device_info['model'] in conf.phones: